@@ -1,11 +1,17 @@
+import argparse
 import json
-import requests
+import os
+import subprocess
 import sys
+import threading
 import time
+from concurrent.futures import ThreadPoolExecutor
 from typing import Optional
 
 MAX_RETRIES = 5
 BASE_BACKOFF = 1  # seconds
+DEFAULT_WORKERS = 8
+DEFAULT_CACHE = '.validate_plugins_cache.json'
 
 def extract_owner_repo_branch(url: str, default_branch: Optional[str] = None):
     if url.startswith("https://github.com/"):
@@ -14,36 +20,87 @@ def extract_owner_repo_branch(url: str, default_branch: Optional[str] = None):
         path = url[len("http://github.com/"):]
     else:
         return None, None, None
-    
+
     parts = path.split('/')
     if len(parts) < 2:
         return None, None, None
-    
+
     owner = parts[0]
     repo = parts[1]
     branch = default_branch
-    
+
     if len(parts) >= 4 and parts[2] == 'tree':
         branch = parts[3]
-    
+
     if repo.endswith('.git'):
         repo = repo[:-4]
 
     return owner, repo, branch
 
-def request_with_retries(url: str, timeout=10):
+class ResponseCache:
+    """ETag cache of API responses stored between runs, unchanged resources are answered with 304"""
+
+    def __init__(self, path: Optional[str]):
+        self.path = path
+        self.entries = {}
+        self.lock = threading.Lock()
+
+        if path and os.path.isfile(path):
+            try:
+                with open(path, 'r') as file:
+                    self.entries = json.load(file)
+            except (OSError, json.JSONDecodeError) as e:
+                print(f"⚠️ Ignoring unreadable cache {path}: {e}")
+
+    def get(self, url: str):
+        with self.lock:
+            return self.entries.get(url)
+
+    def set(self, url: str, etag: str, data):
+        with self.lock:
+            self.entries[url] = {'etag': etag, 'data': data}
+
+    def save(self):
+        if not self.path:
+            return
+
+        with self.lock:
+            with open(self.path + '.tmp', 'w') as file:
+                json.dump(self.entries, file)
+
+        os.replace(self.path + '.tmp', self.path)
+
+def create_session(workers: int, token: Optional[str]):
+    # requests is needed only by HTTP mode
+    import requests
+    from requests.adapters import HTTPAdapter
+
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=workers, pool_maxsize=workers)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    session.headers['Accept'] = 'application/vnd.github+json'
+
+    if token:
+        session.headers['Authorization'] = f"Bearer {token}"
+
+    return session
+
+def request_with_retries(session, url: str, headers=None, timeout=10):
+    import requests
+
     for attempt in range(1, MAX_RETRIES + 1):
         try:
-            response = requests.get(url, timeout=timeout)
-            if response.status_code == 403:
-                if 'X-RateLimit-Remaining' in response.headers and response.headers['X-RateLimit-Remaining'] == '0':
+            response = session.get(url, headers=headers, timeout=timeout)
+            if response.status_code in (403, 429):
+                if response.headers.get('X-RateLimit-Remaining') == '0':
                     reset_time = int(response.headers.get('X-RateLimit-Reset', 0))
                     wait_seconds = max(reset_time - int(time.time()), 1)
                     print(f"⚠️ Rate limit hit. Sleeping for {wait_seconds} seconds before retrying...")
                     time.sleep(wait_seconds)
                     continue
                 else:
-                    print(f"⚠️ Forbidden (403) response for URL: {url}")
+                    print(f"⚠️ Forbidden ({response.status_code}) response for URL: {url}")
                     return response
             return response
         except requests.exceptions.RequestException as e:
@@ -53,26 +110,92 @@ def request_with_retries(url: str, timeout=10):
     print(f"❌ Failed to get a successful response from {url} after {MAX_RETRIES} attempts.")
     return None
 
-def check_url_exists(url: str) -> bool:
-    response = request_with_retries(url)
-    return response is not None and response.status_code == 200
+def get_cached(session, cache: ResponseCache, url: str):
+    """Returns (status code, JSON data, next page url), unchanged responses are taken from the cache"""
+    cached = cache.get(url)
+    headers = {'If-None-Match': cached['etag']} if cached else None
+    response = request_with_retries(session, url, headers)
 
-def check_branch_exists(owner: str, repo: str, branch: str) -> bool:
-    if not branch:
-        return False
-    api_url = f"https://api.github.com/repos/{owner}/{repo}/branches/{branch}"
-    response = request_with_retries(api_url)
     if response is None:
-        return False
-    if response.status_code == 200:
-        return True
-    elif response.status_code == 404:
-        return False
-    else:
-        print(f"⚠️ Unexpected status {response.status_code} for branch check URL: {api_url}")
-        return False
+        return None, None, None
+
+    if response.status_code == 304 and cached:
+        return 200, cached['data']['json'], cached['data']['next']
+
+    if response.status_code != 200:
+        return response.status_code, None, None
+
+    data = {'json': response.json(), 'next': response.links.get('next', {}).get('url')}
+
+    if response.headers.get('ETag'):
+        cache.set(url, response.headers['ETag'], data)
+
+    return 200, data['json'], data['next']
+
+def get_branches_http(session, cache: ResponseCache, api_url: str, owner: str, repo: str):
+    """Returns set of branch names, empty set if repository does not exist, None on error"""
+    url = f"{api_url}/repos/{owner}/{repo}/branches?per_page=100"
+    branches = set()
+
+    # All branches are listed at once instead of one request per branch
+    while url:
+        status, data, url = get_cached(session, cache, url)
+
+        if status == 404:
+            return set()
+        if status != 200:
+            print(f"⚠️ Unexpected status {status} for branches of {owner}/{repo}")
+            return None
+
+        branches.update(branch['name'] for branch in data)
+
+    return branches
+
+def get_branches_git(git_url: str, owner: str, repo: str):
+    """Returns set of branch names using single "git ls-remote" call, empty set if repository does not exist"""
+    url = f"{git_url}/{owner}/{repo}.git"
+    env = dict(os.environ, GIT_TERMINAL_PROMPT='0', GIT_ASKPASS='true', LC_ALL='C')
 
-def validate_plugins(file_path: str):
+    try:
+        result = subprocess.run(['git', 'ls-remote', '--heads', url], stdout=subprocess.PIPE,
+                                stderr=subprocess.PIPE, env=env, timeout=60)
+    except subprocess.TimeoutExpired:
+        print(f"⚠️ Timeout while listing branches of {url}")
+        return None
+
+    if result.returncode != 0:
+        return set()
+
+    branches = set()
+
+    for line in result.stdout.decode('utf-8', 'replace').splitlines():
+        ref = line.split('\t', 1)[-1]
+        if ref.startswith('refs/heads/'):
+            branches.add(ref[len('refs/heads/'):])
+
+    return branches
+
+def load_base_plugins(base: str, file_path: str):
+    """Returns plugins.json content at git revision base, None if it is not available"""
+    try:
+        result = subprocess.run(['git', 'show', f"{base}:{file_path}"], stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    except OSError as e:
+        print(f"⚠️ Unable to run git: {e}")
+        return None
+
+    if result.returncode != 0:
+        print(f"⚠️ Unable to read {file_path} at {base}: {result.stderr.decode('utf-8', 'replace').strip()}")
+        return None
+
+    try:
+        return json.loads(result.stdout.decode('utf-8'))
+    except json.JSONDecodeError as e:
+        print(f"⚠️ {file_path} at {base} is not valid JSON: {e}")
+        return None
+
+def validate_plugins(file_path: str, mode: str = 'http', workers: int = DEFAULT_WORKERS, cache_path: Optional[str] = DEFAULT_CACHE,
+                     base: Optional[str] = None, github_url: str = 'https://github.com', api_url: str = 'https://api.github.com',
+                     token: Optional[str] = None):
     try:
         with open(file_path, 'r') as file:
             plugins = json.load(file)
@@ -80,10 +203,18 @@ def validate_plugins(file_path: str):
         print(f"Error reading {file_path}: {e}")
         sys.exit(1)
 
+    if base:
+        base_plugins = load_base_plugins(base, file_path)
+
+        if base_plugins is not None:
+            plugins = dict((key, plugin) for key, plugin in plugins.items() if base_plugins.get(key) != plugin)
+            print(f"Validating {len(plugins)} plugin(s) changed since {base}")
+
     valid_plugins = []
     broken_urls = []
     missing_branches = []
     invalid_branch_format = []
+    checks = {}
 
     for key, plugin in plugins.items():
         url = plugin.get('repository')
@@ -100,14 +231,7 @@ def validate_plugins(file_path: str):
             broken_urls.append((key, url))
             continue
 
-        repo_url = f"https://github.com/{owner}/{repo}"
-        if not check_url_exists(repo_url):
-            print(f"Broken repository URL: {repo_url}")
-            broken_urls.append((key, repo_url))
-            continue
-
         # Determine branches to check (normalize to list)
-        branches_to_check = None
         if branch_field:
             if isinstance(branch_field, list):
                 branches_to_check = branch_field
@@ -118,15 +242,41 @@ def validate_plugins(file_path: str):
                 invalid_branch_format.append((key, branch_field))
                 continue
         else:
-            if branch_from_url:
-                branches_to_check = [branch_from_url]
-            else:
-                branches_to_check = ['master']
+            branches_to_check = [branch_from_url] if branch_from_url else ['master']
+
+        checks[key] = (owner, repo, branches_to_check)
+
+    # Each repository is checked once, even if several plugins (branches, forks of catalog entries) use it
+    repositories = sorted(set((owner, repo) for owner, repo, branches in checks.values()))
+    cache = ResponseCache(cache_path if mode == 'http' else None)
+
+    if mode == 'git':
+        def get_branches(repository):
+            return get_branches_git(github_url, *repository)
+    else:
+        session = create_session(workers, token)
+
+        def get_branches(repository):
+            return get_branches_http(session, cache, api_url, *repository)
+
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+        repository_branches = dict(zip(repositories, executor.map(get_branches, repositories)))
+
+    cache.save()
+
+    for key, (owner, repo, branches_to_check) in checks.items():
+        repo_url = f"https://github.com/{owner}/{repo}"
+        branches = repository_branches[(owner, repo)]
+
+        if not branches:
+            print(f"Broken repository URL: {repo_url}")
+            broken_urls.append((key, repo_url))
+            continue
 
         # Check all branches exist
         all_branches_valid = True
         for branch in branches_to_check:
-            if not check_branch_exists(owner, repo, branch):
+            if branch not in branches:
                 print(f"❌ Branch '{branch}' does NOT exist for plugin '{key}' at URL: {repo_url}/tree/{branch}")
                 missing_branches.append((key, branch, f"{repo_url}/tree/{branch}"))
                 all_branches_valid = False
@@ -151,4 +301,16 @@ def validate_plugins(file_path: str):
         sys.exit(1)
 
 if __name__ == "__main__":
-    validate_plugins('plugins.json')
+    parser = argparse.ArgumentParser(description='Validates repositories and branches of plugins.json entries')
+    parser.add_argument('file', nargs='?', default='plugins.json')
+    parser.add_argument('--mode', choices=['http', 'git'], default='http',
+                        help='"http" uses GitHub API, "git" lists branches with "git ls-remote"')
+    parser.add_argument('--workers', type=int, default=DEFAULT_WORKERS, help='max number of repositories checked at the same time')
+    parser.add_argument('--cache', default=DEFAULT_CACHE, help='ETag cache file of HTTP mode, empty to disable')
+    parser.add_argument('--base', help='git revision, only entries changed since it are validated')
+    parser.add_argument('--github-url', default='https://github.com', help='base url of git repositories (git mode)')
+    parser.add_argument('--api-url', default='https://api.github.com', help='base url of GitHub API (HTTP mode)')
+    args = parser.parse_args()
+
+    validate_plugins(args.file, args.mode, args.workers, args.cache or None, args.base,
+                     args.github_url.rstrip('/'), args.api_url.rstrip('/'), os.environ.get('GITHUB_TOKEN'))
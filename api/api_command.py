@@ -1,20 +1,63 @@
+from contextlib import contextmanager
+import threading
 import Domoticz
+from locks import get_plugin_lock
 
 
 class APICommand():
+    # Identical concurrent requests of read-only commands share a single execution
+    coalesce = False
+    # Plugin installed or updated, but pip failed (e.g. missing pip or externally managed environment)
+    dependencies_warning = 'Requirements of the plugin could not be installed, please check Domoticz Log for more details.'
+
     def __init__(self, request_id, send_response, send_update):
         self.request_id = request_id
         self.execute_send_response = send_response
         self.execute_send_update = send_update
+        self.cancel_event = threading.Event()
 
     def send_update(self, payload):
         self.execute_send_update(self.request_id, payload)
 
+    def send_progress(self, stage, percent):
+        self.send_update({
+            'event': 'progress',
+            'stage': stage,
+            'percent': percent,
+        })
+
     def send_response(self, payload):
         self.execute_send_response(self.request_id, False, payload)
 
     def send_error(self, payload):
         self.execute_send_response(self.request_id, True, payload)
 
+    def cancel(self):
+        self.cancel_event.set()
+
+    def is_cancelled(self):
+        return self.cancel_event.is_set()
+
+    @contextmanager
+    def plugin_lock(self, key):
+        """Waits until no other command changes the plugin, yields False if the command is cancelled meanwhile"""
+        lock = get_plugin_lock(key)
+        acquired = lock.acquire(blocking=False)
+
+        if not acquired:
+            self.send_update({
+                'event': 'waiting',
+                'key': key,
+            })
+
+            while not acquired and not self.is_cancelled():
+                acquired = lock.acquire(timeout=0.5)
+
+        try:
+            yield acquired
+        finally:
+            if acquired:
+                lock.release()
+
     def execute(self, params):
         Domoticz.Error('Command is not implemented')
@@ -1,13 +1,30 @@
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+import base64
+import threading
+import zlib
 import Domoticz
 import json
+import config
 from api.commands import commands
+from api.jobs import Job
+from stats import stats
 
 
 class APIManager:
     def __init__(self, devices):
         self.unit = 255
         self.devices = devices
-        self.requests = {}
+        # Running commands by server side job id (request ids are chosen by clients and may repeat),
+        # identical read-only requests are joined by their coalesce key
+        self.jobs = {}
+        self.coalesced = {}
+        self.compressed_requests = set()
+        self.job_id = 0
+        self.message_id = 0
+        self.lock = threading.Lock()
+        self.device_lock = threading.Lock()
+        self.executor = ThreadPoolExecutor(max_workers=max(1, config.settings['command_workers']))
 
         self._create_transport()
 
@@ -19,18 +36,101 @@ class APIManager:
             Domoticz.Debug('New request: [' + str(request_id) + '] ' +
                            data['command'] + '(' + json.dumps(data['params']) + ')')
 
-            if data['command'] in commands:
-                command = commands[data['command']](
-                    request_id,
-                    self._send_response,
-                    self._send_update,
-                )
+            # Client supports decompression of chunked responses
+            if data.get('compression'):
+                with self.lock:
+                    self.compressed_requests.add(request_id)
 
-                self.requests.update({request_id: command})
-                command.execute(data['params'])
+            if data['command'] == 'cancel':
+                self._cancel_request(request_id, data['params'])
+            elif data['command'] == 'jobs':
+                self._send_jobs(request_id)
+            elif data['command'] in commands:
+                self._start_job(request_id, data['command'], data['params'])
             else:
                 self._send_response(data['requestId'], True, 'unknown command')
 
+    def stop(self):
+        with self.lock:
+            running = list(self.jobs.values())
+
+        for job in running:
+            job.command.cancel()
+
+        self.executor.shutdown(wait=True)
+
+    def _start_job(self, request_id, name, params):
+        command_class = commands[name]
+        coalesce_key = name + ':' + json.dumps(params, sort_keys=True) if command_class.coalesce else None
+
+        with self.lock:
+            leader = self.coalesced.get(coalesce_key) if coalesce_key is not None else None
+
+            # The same request is already running, its response will be sent to this request too
+            if leader is not None:
+                if request_id != leader.request_id and request_id not in leader.followers:
+                    leader.followers.append(request_id)
+
+                Domoticz.Debug('Request [' + str(request_id) + '] joined running request [' + str(leader.request_id) + ']')
+                return
+
+            self.job_id += 1
+            job = Job(self.job_id, request_id, name, params, coalesce_key)
+            # Command responds through its own job, so it never finishes another job with the same request id
+            job.command = command_class(request_id, partial(self._send_job_response, job), partial(self._send_job_update, job))
+            self.jobs[job.job_id] = job
+
+            if coalesce_key is not None:
+                self.coalesced[coalesce_key] = job
+
+        # Commands run git and may take long time, so they are executed outside of Domoticz callback
+        self.executor.submit(self._execute, name, job.command, params)
+
+    def _send_jobs(self, request_id):
+        with self.lock:
+            jobs = [job.to_dict() for job in self.jobs.values()]
+
+        self._send_response(request_id, False, {'jobs': jobs})
+
+    def _execute(self, name, command, params):
+        try:
+            with stats.timer('command.' + name):
+                command.execute(params)
+        except Exception as e:
+            Domoticz.Error('Request [' + str(command.request_id) + '] failed: ' + repr(e))
+            command.send_error('Unexpected error occurred. Please check Domoticz Log for more details.')
+
+    def _cancel_request(self, request_id, params):
+        target_id = params.get('requestId') if isinstance(params, dict) else params
+
+        with self.lock:
+            # Job may be cancelled by its id from the jobs list as well
+            if isinstance(params, dict) and 'jobId' in params:
+                job = self.jobs.get(params['jobId'])
+                target_id = job.request_id if job is not None else target_id
+            else:
+                job = next((item for item in self.jobs.values() if item.request_id == target_id), None)
+
+            leader = None
+
+            # Request joined to another one only stops waiting for it, the shared execution goes on
+            if job is None:
+                leader = next((item for item in self.jobs.values() if target_id in item.followers), None)
+
+                if leader is not None:
+                    leader.followers.remove(target_id)
+
+        if leader is not None:
+            self._send_response(target_id, True, 'Request has been cancelled')
+        elif job is None:
+            self._send_response(request_id, True, 'Request ' + str(target_id) + ' is not running')
+            return
+        else:
+            Domoticz.Log('Cancelling request [' + str(target_id) + ']')
+            job.command.cancel()
+
+        self._send_response(request_id, False, 'Request ' + str(target_id) + ' has been cancelled')
+
     def _create_transport(self):
         if self.unit in self.devices:
             return
@@ -42,26 +142,86 @@ class APIManager:
             TypeName="Text"
         ).Create()
 
-    def _update_api_device(self, payload):
-        self.devices[self.unit].Update(
-            nValue=0,
-            sValue=payload
-        )
+    def _update_api_device(self, payload, request_id=None, compress=False):
+        chunk_size = config.settings['transport_chunk_size']
+
+        stats.record('transport.payload_size', len(payload))
+
+        # Responses and progress updates are posted from command worker threads
+        with self.device_lock, stats.timer('transport.device_update'):
+            if len(payload) <= chunk_size:
+                self.devices[self.unit].Update(
+                    nValue=0,
+                    sValue=payload
+                )
+                return
+
+            # Large payloads are split into several small device updates which client reassembles
+            encoding = 'plain'
+
+            if compress:
+                payload = base64.b64encode(zlib.compress(payload.encode('utf-8'))).decode('ascii')
+                encoding = 'zlib+base64'
+
+            self.message_id += 1
+            total = (len(payload) + chunk_size - 1) // chunk_size
+
+            for index in range(total):
+                self.devices[self.unit].Update(
+                    nValue=0,
+                    sValue=json.dumps({
+                        'type': 'chunk',
+                        'requestId': request_id,
+                        'messageId': self.message_id,
+                        'index': index,
+                        'total': total,
+                        'encoding': encoding,
+                        'data': payload[index * chunk_size:(index + 1) * chunk_size],
+                    })
+                )
+
+    def _send_job_response(self, job, request_id, is_error, payload):
+        with self.lock:
+            if self.jobs.get(job.job_id) is job:
+                del self.jobs[job.job_id]
+
+            if self.coalesced.get(job.coalesce_key) is job:
+                del self.coalesced[job.coalesce_key]
+
+            followers = list(job.followers)
+
+        for target_id in [request_id] + followers:
+            self._send_response(target_id, is_error, payload)
 
     def _send_response(self, request_id, is_error, payload):
-        if request_id in self.requests:
-            del self.requests[request_id]
+        with self.lock:
+            compress = request_id in self.compressed_requests
+            self.compressed_requests.discard(request_id)
 
-        self._update_api_device(json.dumps({
-            'type': 'response',
-            'requestId': request_id,
-            'isError': is_error,
-            'payload': payload
-        }))
+        with stats.timer('transport.serialize'):
+            message = json.dumps({
+                'type': 'response',
+                'requestId': request_id,
+                'isError': is_error,
+                'payload': payload
+            })
+
+        self._update_api_device(message, request_id, compress and config.settings['transport_compression'])
+
+    def _send_job_update(self, job, request_id, payload):
+        with self.lock:
+            job.last_update = payload
+            followers = list(job.followers)
+
+        for target_id in [request_id] + followers:
+            self._send_update(target_id, payload)
 
     def _send_update(self, request_id, payload):
+        with self.lock:
+            compress = request_id in self.compressed_requests
+
         self._update_api_device(json.dumps({
             'type': 'status',
             'requestId': request_id,
             'payload': payload
-        }))
+        }), request_id, compress and config.settings['transport_compression'])
@@ -0,0 +1,106 @@
+from concurrent.futures import ThreadPoolExecutor
+from api.api_command import APICommand
+from plugins import plugins
+import Domoticz
+import config
+
+
+class BatchCommand(APICommand):
+    """Runs the same action for several plugins concurrently and responds with single result map"""
+
+    success_message = 'Operation has been successfully completed.'
+    restart_message = 'Please restart Domoticz to take effect.'
+
+    def execute(self, params):
+        items = self.get_items(params)
+
+        if items is None:
+            self.send_error('Plugin key is missing')
+            return None
+
+        unknown = [key for key in items if key not in plugins]
+
+        if unknown:
+            self.send_error('Plugins not found: ' + ', '.join(unknown))
+            return None
+
+        results = {}
+
+        if items:
+            workers = max(1, min(config.settings['batch_workers'], len(items)))
+
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                futures = dict((key, executor.submit(self._process, key, item_params)) for key, item_params in items.items())
+
+                for key, future in futures.items():
+                    results[key] = future.result()
+
+        succeeded = [key for key, result in results.items() if result['success']]
+        restart = [key for key in succeeded if results[key].get('restart_required', True)]
+        message = self.success_message if len(succeeded) == len(results) else \
+            'Operation has failed for some plugins. Please check Domoticz Log for more details.'
+
+        dependencies_failed = [key for key in succeeded if not results[key].get('dependencies', True)]
+
+        if dependencies_failed:
+            message += ' Requirements of ' + ', '.join(dependencies_failed) + ' could not be installed.'
+
+        if restart:
+            Domoticz.Log('---Restarting Domoticz MAY BE REQUIRED to activate ' + ', '.join(restart) + '---')
+            message += ' ' + self.restart_message
+
+        self.send_response({
+            'message': message,
+            'results': results,
+        })
+
+    def get_items(self, params):
+        """Returns {plugin key: item params} from request params or None if an item has no key"""
+        if isinstance(params, dict):
+            params = params.get('keys', [])
+
+        items = {}
+
+        for item in params or []:
+            if isinstance(item, dict):
+                if not item.get('key'):
+                    return None
+
+                items[item['key']] = item
+            else:
+                items[item] = {}
+
+        return items
+
+    def process(self, key, plugin, params, on_progress):
+        """Returns True or result details dict if action succeeded for given plugin"""
+        Domoticz.Error('Command is not implemented')
+        return False
+
+    def _process(self, key, params):
+        def on_progress(stage, percent):
+            self.send_update({
+                'event': 'progress',
+                'key': key,
+                'stage': stage,
+                'percent': percent,
+            })
+
+        details = {}
+
+        try:
+            with self.plugin_lock(key) as acquired:
+                result = self.process(key, plugins[key], params, on_progress) if acquired else None
+                success = bool(result)
+                details = result if isinstance(result, dict) else {}
+        except Exception as e:
+            Domoticz.Error('Batch operation for plugin "' + key + '" failed: ' + repr(e))
+            success = False
+
+        self.send_update({
+            'event': 'done',
+            'key': key,
+            'success': success,
+        })
+
+        return dict(details, success=success)
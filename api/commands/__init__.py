@@ -2,10 +2,24 @@ from api.commands.list import List
 from api.commands.install import Install
 from api.commands.uninstall import Uninstall
 from api.commands.update import Update
+from api.commands.install_many import InstallMany
+from api.commands.uninstall_many import UninstallMany
+from api.commands.update_many import UpdateMany
+from api.commands.stats import Stats
+from api.commands.switch_branch import SwitchBranch
+from api.commands.restore import Restore
+from api.commands.maintenance import Maintenance
 
 commands = dict({
     'list': List,
     'install': Install,
     'uninstall': Uninstall,
-    'update': Update
+    'update': Update,
+    'install_many': InstallMany,
+    'uninstall_many': UninstallMany,
+    'update_many': UpdateMany,
+    'stats': Stats,
+    'switch_branch': SwitchBranch,
+    'restore': Restore,
+    'maintenance': Maintenance,
 })
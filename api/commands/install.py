@@ -1,5 +1,7 @@
 from api.api_command import APICommand
+from manager import STATUS_UP_TO_DATE
 from plugins import plugins
+from updates import cache
 import Domoticz
 
 
@@ -8,9 +10,11 @@ class Install(APICommand):
         if isinstance(params, dict):
             plugin_key = params.get('key')
             branch = params.get('branch')
+            mode = params.get('mode')
         else:
             plugin_key = params
             branch = None
+            mode = None
 
         Domoticz.Log(f"Received install request for plugin: {plugin_key}, branch: {branch}")
 
@@ -20,7 +24,22 @@ class Install(APICommand):
 
         plugin = plugins[plugin_key]
 
-        if plugin.install(branch):
-            self.send_response('Plugin has been successfully installed. Please restart Domoticz to take effect.')
-        else:
-            self.send_error('Error occurred during plugin installation. Please check Domoticz Log for more details.')
+        with self.plugin_lock(plugin_key) as acquired:
+            if not acquired:
+                self.send_error('Plugin installation has been cancelled.')
+                return None
+
+            result = plugin.install(branch, self.send_progress, self.cancel_event, mode)
+
+            if result:
+                cache.set(plugin_key, STATUS_UP_TO_DATE)
+                message = 'Plugin has been successfully installed. Please restart Domoticz to take effect.'
+
+                if not result['dependencies']:
+                    message += ' ' + self.dependencies_warning
+
+                self.send_response(message)
+            elif self.is_cancelled():
+                self.send_error('Plugin installation has been cancelled.')
+            else:
+                self.send_error('Error occurred during plugin installation. Please check Domoticz Log for more details.')
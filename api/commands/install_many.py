@@ -0,0 +1,15 @@
+from api.batch_command import BatchCommand
+from manager import STATUS_UP_TO_DATE
+from updates import cache
+
+
+class InstallMany(BatchCommand):
+    success_message = 'Plugins have been successfully installed.'
+
+    def process(self, key, plugin, params, on_progress):
+        result = plugin.install(params.get('branch'), on_progress, self.cancel_event, params.get('mode'))
+
+        if result:
+            cache.set(key, STATUS_UP_TO_DATE)
+
+        return result
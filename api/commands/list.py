@@ -1,21 +1,238 @@
+import heapq
 from api.api_command import APICommand
+from api.snapshots import snapshots
+from installed import installed_index
+from manager import STATUS_BEHIND
 from plugins import plugins
+from search import SORT_FIELDS
+from updates import cache
+
+PAGE_PARAMS = ('query', 'installed', 'outdated', 'sort', 'offset', 'limit')
+DEFAULT_LIMIT = 50
+MAX_LIMIT = 500
 
 
 class List(APICommand):
+    coalesce = True
+
     def execute(self, params):
-        response = {}
+        # Search, filter or pagination parameters request a single page instead of the whole versioned catalog
+        if isinstance(params, dict) and any(name in params for name in PAGE_PARAMS):
+            self.execute_page(params)
+            return
+
+        since = params.get('since') if isinstance(params, dict) else None
+        entries = {}
+        hashes = {}
+        ages = {}
+        installed = {}
+
+        matched_folders = set()
 
         for key, plugin in plugins.items():
-            response[key] = {
-                'key': key,
-                'author': plugin.author,
-                'description': plugin.description,
-                'name': plugin.name,
-                'source': plugin.repository + '/tree/' + plugin.branch[0],
-                'branches': plugin.branch,
-                'is_installed': plugin.is_installed(),
-                'is_update_available': plugin.is_update_available(),
-            }
-
-        self.send_response(response)
+            installed_entry = plugin.get_installed()
+            is_installed = installed_entry is not None
+            update_status, update_status_age = cache.get(key) if is_installed else (None, None)
+            branch = installed_index.get_git_info(installed_entry)['branch'] if is_installed else None
+
+            if is_installed:
+                installed[key] = plugin
+                matched_folders.add(installed_entry['folder'])
+
+            # Status age changes every second, so it is not a part of entry version
+            entries[key], hashes[key] = snapshots.get_entry(
+                key,
+                (plugin, is_installed, update_status, branch),
+                lambda: self.build_entry(key, plugin, is_installed, update_status, branch)
+            )
+            ages[key] = update_status_age
+
+        # Plugins installed manually and not present in the catalog
+        for folder, installed_entry in installed_index.refresh().items():
+            if folder in matched_folders or not installed_entry['has_plugin_py']:
+                continue
+
+            key = 'local:' + folder
+            installed_entry = installed_index.get_git_info(installed_entry)
+            entries[key], hashes[key] = snapshots.get_entry(
+                key,
+                (installed_entry['folder'], installed_entry['remote_url'], installed_entry['branch']),
+                lambda: self.build_local_entry(key, installed_entry)
+            )
+            ages[key] = None
+
+        cache.refresh(installed)
+        version = snapshots.add(hashes)
+
+        if since == version:
+            self.send_response({
+                'version': version,
+                'not_modified': True,
+            })
+            return
+
+        previous = snapshots.get(since) if since else None
+
+        if previous is None:
+            changed = list(hashes)
+            removed = []
+        else:
+            changed = [key for key, entry_hash in hashes.items() if previous.get(key) != entry_hash]
+            removed = [key for key in previous if key not in hashes]
+
+        self.send_response({
+            'version': version,
+            'full': previous is None,
+            'plugins': dict((key, dict(entries[key], update_status_age=ages[key])) for key in changed),
+            'removed': removed,
+        })
+
+    def execute_page(self, params):
+        query = params.get('query') or ''
+        installed_filter = params.get('installed')
+        outdated_filter = params.get('outdated')
+        sort = params.get('sort') or 'name'
+        descending = sort.startswith('-')
+        sort_field = sort.lstrip('-')
+
+        try:
+            offset = max(int(params.get('offset') or 0), 0)
+            limit = min(max(int(params.get('limit') if params.get('limit') is not None else DEFAULT_LIMIT), 0), MAX_LIMIT)
+        except (TypeError, ValueError):
+            self.send_error('Invalid offset or limit')
+            return
+
+        if sort_field not in SORT_FIELDS:
+            self.send_error('Unknown sort field "' + sort_field + '"')
+            return
+
+        records = plugins.records
+        search_index = plugins.search_index
+        matched = search_index.search(query)
+
+        # Filters only use installed plugins index and cached status, nothing is computed for plugins outside the page
+        def is_matching(key):
+            record = records.get(key)
+
+            if record is None or (matched is not None and key not in matched):
+                return False
+
+            if installed_filter is None and not outdated_filter:
+                return True
+
+            installed_entry = installed_index.find(record.folder, record.repository)
+
+            if installed_filter is not None and (installed_entry is not None) != bool(installed_filter):
+                return False
+
+            return not outdated_filter or (installed_entry is not None and cache.get(key)[0] == STATUS_BEHIND)
+
+        catalog_keys = (key for key in search_index.get_order(sort_field, descending) if is_matching(key))
+        sort_values = search_index.sort_values[sort_field]
+
+        def sort_value(key):
+            if key in sort_values:
+                return (sort_values[key], key)
+
+            # Local plugins have no author, they are sorted by folder name
+            return ('' if sort_field == 'author' else key[len('local:'):].lower(), key)
+
+        local_keys = sorted(self.get_local_page_keys(search_index, query, installed_filter, outdated_filter), key=sort_value, reverse=descending)
+
+        total = 0
+        page = []
+
+        for key in heapq.merge(catalog_keys, local_keys, key=sort_value, reverse=descending):
+            if offset <= total < offset + limit:
+                page.append(key)
+
+            total += 1
+
+        entries = []
+        installed = {}
+
+        for key in page:
+            if key.startswith('local:'):
+                installed_entry = installed_index.get_git_info(installed_index.get(key[len('local:'):]))
+                entries.append(dict(self.build_local_entry(key, installed_entry), update_status_age=None))
+                continue
+
+            plugin = plugins[key]
+            installed_entry = plugin.get_installed()
+            is_installed = installed_entry is not None
+            update_status, update_status_age = cache.get(key) if is_installed else (None, None)
+            branch = installed_index.get_git_info(installed_entry)['branch'] if is_installed else None
+
+            if is_installed:
+                installed[key] = plugin
+
+            entry, entry_hash = snapshots.get_entry(
+                key,
+                (plugin, is_installed, update_status, branch),
+                lambda: self.build_entry(key, plugin, is_installed, update_status, branch)
+            )
+            entries.append(dict(entry, update_status_age=update_status_age))
+
+        cache.refresh(installed)
+
+        self.send_response({
+            'total': total,
+            'offset': offset,
+            'limit': limit,
+            'plugins': entries,
+        })
+
+    def get_local_page_keys(self, search_index, query, installed_filter, outdated_filter):
+        """Returns keys of manually installed plugins matching the page filters"""
+        if installed_filter is False or outdated_filter:
+            return []
+
+        tokens = query.lower().split()
+        keys = []
+
+        for folder, installed_entry in installed_index.refresh().items():
+            # Catalog plugins are found by their own folder or by repository url
+            if folder in search_index.folders or installed_entry['remote_url'] in search_index.repositories:
+                continue
+
+            if installed_entry['has_plugin_py'] and all(token in folder.lower() for token in tokens):
+                keys.append('local:' + folder)
+
+        return keys
+
+    def build_entry(self, key, plugin, is_installed, update_status, branch):
+        return {
+            'key': key,
+            'author': plugin.author,
+            'description': plugin.description,
+            'name': plugin.name,
+            'source': plugin.repository + '/tree/' + plugin.branch[0],
+            'branches': plugin.branch,
+            # Checked out branch of installed plugin
+            'branch': branch,
+            'is_installed': is_installed,
+            'is_update_available': update_status == STATUS_BEHIND,
+            'update_status': update_status,
+        }
+
+    def build_local_entry(self, key, installed_entry):
+        return {
+            'key': key,
+            'author': '',
+            'description': 'Installed manually, not available in the catalog',
+            'name': installed_entry['folder'],
+            'source': self.get_local_source(installed_entry['remote_url']),
+            'branches': [installed_entry['branch']] if installed_entry['branch'] else [],
+            'branch': installed_entry['branch'],
+            'is_installed': True,
+            'is_local': True,
+            'is_update_available': False,
+            'update_status': None,
+        }
+
+    def get_local_source(self, remote_url):
+        # Local paths can not be opened from the browser
+        if not remote_url or remote_url.startswith('/'):
+            return ''
+
+        return 'https://' + remote_url
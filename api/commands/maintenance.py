@@ -0,0 +1,22 @@
+from api.api_command import APICommand
+from maintenance import maintenance
+
+
+class Maintenance(APICommand):
+    def execute(self, params):
+        # Sizes are in bytes, {'run': True, 'mode': 'auto' | 'full'} runs git gc before reporting
+        if isinstance(params, dict) and params.get('run'):
+            result = maintenance.run(params.get('mode'), self.send_progress, self.cancel_event)
+
+            if result is None:
+                self.send_error('Maintenance is already running.')
+                return None
+
+            if self.is_cancelled():
+                self.send_error('Maintenance has been cancelled.')
+                return None
+
+            self.send_response(dict(maintenance.get_report(), maintenance=result))
+            return None
+
+        self.send_response(maintenance.get_report())
@@ -0,0 +1,21 @@
+from api.api_command import APICommand
+from plugins import plugins
+
+
+class Restore(APICommand):
+    def execute(self, params):
+        if params not in plugins:
+            self.send_error('Plugin not found')
+            return None
+
+        plugin = plugins[params]
+
+        with self.plugin_lock(params) as acquired:
+            if not acquired:
+                self.send_error('Plugin restore has been cancelled.')
+                return None
+
+            if plugin.restore():
+                self.send_response('Plugin has been successfully restored. Please restart Domoticz to take effect.')
+            else:
+                self.send_error('Error occurred during plugin restore. Please check Domoticz Log for more details.')
@@ -0,0 +1,13 @@
+from api.api_command import APICommand
+from stats import stats
+
+
+class Stats(APICommand):
+    def execute(self, params):
+        # Timings are in milliseconds, payload sizes in bytes
+        snapshot = stats.snapshot()
+
+        if isinstance(params, dict) and params.get('reset'):
+            stats.reset()
+
+        self.send_response(snapshot)
@@ -0,0 +1,37 @@
+from api.api_command import APICommand
+from manager import STATUS_UP_TO_DATE
+from plugins import plugins
+from updates import cache
+
+
+class SwitchBranch(APICommand):
+    def execute(self, params):
+        plugin_key = params.get('key') if isinstance(params, dict) else None
+        branch = params.get('branch') if isinstance(params, dict) else None
+
+        if plugin_key not in plugins:
+            self.send_error('Plugin not found')
+            return None
+
+        if not branch:
+            self.send_error('Branch is not specified')
+            return None
+
+        plugin = plugins[plugin_key]
+
+        if not plugin.is_installed():
+            self.send_error('Plugin is not installed')
+            return None
+
+        with self.plugin_lock(plugin_key) as acquired:
+            if not acquired:
+                self.send_error('Branch switch has been cancelled.')
+                return None
+
+            if plugin.switch_branch(branch, self.send_progress, self.cancel_event):
+                cache.set(plugin_key, STATUS_UP_TO_DATE)
+                self.send_response('Plugin has been switched to branch "' + branch + '". Please restart Domoticz to take effect.')
+            elif self.is_cancelled():
+                self.send_error('Branch switch has been cancelled.')
+            else:
+                self.send_error('Error occurred during branch switch. Please check Domoticz Log for more details.')
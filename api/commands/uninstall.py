@@ -1,5 +1,6 @@
 from api.api_command import APICommand
 from plugins import plugins
+from updates import cache
 
 
 class Uninstall(APICommand):
@@ -10,7 +11,13 @@ class Uninstall(APICommand):
 
         plugin = plugins[params]
 
-        if (plugin.uninstall()):
-            self.send_response('Plugin has been succesfully uninstalled. Please restart Domoticz to take effect.')
-        else:
-            self.send_error('Error occured during plugin uninstallation. Please check Domoticz Log for more details.')
+        with self.plugin_lock(params) as acquired:
+            if not acquired:
+                self.send_error('Plugin uninstallation has been cancelled.')
+                return None
+
+            if (plugin.uninstall()):
+                cache.discard(params)
+                self.send_response('Plugin has been succesfully uninstalled. Please restart Domoticz to take effect.')
+            else:
+                self.send_error('Error occured during plugin uninstallation. Please check Domoticz Log for more details.')
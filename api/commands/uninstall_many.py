@@ -0,0 +1,13 @@
+from api.batch_command import BatchCommand
+from updates import cache
+
+
+class UninstallMany(BatchCommand):
+    success_message = 'Plugins have been successfully uninstalled.'
+
+    def process(self, key, plugin, params, on_progress):
+        if plugin.uninstall():
+            cache.discard(key)
+            return True
+
+        return False
@@ -1,5 +1,7 @@
 from api.api_command import APICommand
+from manager import STATUS_UP_TO_DATE
 from plugins import plugins
+from updates import cache
 
 
 class Update(APICommand):
@@ -10,7 +12,28 @@ class Update(APICommand):
 
         plugin = plugins[params]
 
-        if (plugin.update()):
-            self.send_response('Plugin has been succesfully updated. Please restart Domoticz to take effect.')
-        else:
-            self.send_error('Error occured during plugin update. Please check Domoticz Log for more details.')
+        with self.plugin_lock(params) as acquired:
+            if not acquired:
+                self.send_error('Plugin update has been cancelled.')
+                return None
+
+            result = plugin.update(self.send_progress, self.cancel_event)
+
+            if result is not None:
+                cache.set(params, STATUS_UP_TO_DATE)
+
+                if result['old'] == result['new']:
+                    message = 'Plugin is already up to date.'
+                elif result['restart_required']:
+                    message = 'Plugin has been succesfully updated. Please restart Domoticz to take effect.'
+                else:
+                    message = 'Plugin has been succesfully updated. Only documentation has changed, Domoticz restart is not required.'
+
+                if not result['dependencies']:
+                    message += ' ' + self.dependencies_warning
+
+                self.send_response(dict(result, message=message))
+            elif self.is_cancelled():
+                self.send_error('Plugin update has been cancelled.')
+            else:
+                self.send_error('Error occured during plugin update. Please check Domoticz Log for more details.')
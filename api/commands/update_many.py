@@ -0,0 +1,26 @@
+from api.batch_command import BatchCommand
+from manager import STATUS_BEHIND, STATUS_UP_TO_DATE
+from plugins import plugins
+from updates import cache
+
+
+class UpdateMany(BatchCommand):
+    success_message = 'Plugins have been successfully updated.'
+
+    def get_items(self, params):
+        # "outdated" updates every installed plugin known to be behind its remote branch
+        if params == 'outdated' or (isinstance(params, dict) and params.get('outdated')):
+            return dict(
+                (key, {}) for key, plugin in plugins.items()
+                if plugin.is_installed() and cache.get(key)[0] == STATUS_BEHIND
+            )
+
+        return super().get_items(params)
+
+    def process(self, key, plugin, params, on_progress):
+        result = plugin.update(on_progress, self.cancel_event)
+
+        if result is not None:
+            cache.set(key, STATUS_UP_TO_DATE)
+
+        return result
@@ -0,0 +1,29 @@
+import time
+
+
+class Job():
+    """Running API command, requests with identical coalesce key join it as followers and get the same response"""
+
+    def __init__(self, job_id, request_id, name, params, coalesce_key=None):
+        self.job_id = job_id
+        self.request_id = request_id
+        self.name = name
+        self.params = params
+        self.command = None
+        self.coalesce_key = coalesce_key
+        self.followers = []
+        self.started_at = time.time()
+        self.last_update = None
+
+    def to_dict(self):
+        return {
+            'jobId': self.job_id,
+            'requestId': self.request_id,
+            'command': self.name,
+            'params': self.params,
+            'followers': list(self.followers),
+            'running_for': round(time.time() - self.started_at, 1),
+            'cancelled': self.command.is_cancelled(),
+            # Last progress or waiting event sent by the command
+            'last_update': self.last_update,
+        }
@@ -0,0 +1,51 @@
+from collections import OrderedDict
+import hashlib
+import json
+import threading
+
+
+class ListSnapshots():
+    """Remembers recent versions of the plugins list so clients can receive only changed entries"""
+
+    def __init__(self, size=20):
+        self.size = size
+        self.history = OrderedDict()
+        self.entries = {}
+        self.lock = threading.Lock()
+
+    def get_entry(self, key, source, build):
+        """Returns (entry, entry hash), entry is rebuilt by build() only when its source tuple has changed"""
+        with self.lock:
+            cached = self.entries.get(key)
+
+        if cached is not None and cached[0] == source:
+            return cached[1], cached[2]
+
+        entry = build()
+        entry_hash = hashlib.sha1(json.dumps(entry, sort_keys=True).encode('utf-8')).hexdigest()
+
+        with self.lock:
+            self.entries[key] = (source, entry, entry_hash)
+
+        return entry, entry_hash
+
+    def add(self, hashes):
+        """Stores {key: entry hash} snapshot, returns its version"""
+        content = '\n'.join(key + ':' + hashes[key] for key in sorted(hashes))
+        version = hashlib.sha1(content.encode('utf-8')).hexdigest()[:16]
+
+        with self.lock:
+            self.history[version] = hashes
+            self.history.move_to_end(version)
+
+            while len(self.history) > self.size:
+                self.history.popitem(last=False)
+
+        return version
+
+    def get(self, version):
+        with self.lock:
+            return self.history.get(version)
+
+
+snapshots = ListSnapshots()
@@ -0,0 +1,61 @@
+"""Minimal stand-in of the Domoticz plugin framework module used by benchmarks"""
+import sys
+
+debugging = 0
+heartbeat = 10
+log_stream = sys.stderr
+verbose = False
+
+
+def Log(message):
+    if verbose:
+        print('Log: ' + str(message), file=log_stream)
+
+
+def Status(message):
+    Log(message)
+
+
+def Debug(message):
+    if verbose and debugging:
+        print('Debug: ' + str(message), file=log_stream)
+
+
+def Error(message):
+    print('Error: ' + str(message), file=log_stream)
+
+
+def Debugging(level):
+    global debugging
+    debugging = level
+
+
+def Heartbeat(seconds):
+    global heartbeat
+    heartbeat = seconds
+
+
+class Device():
+    def __init__(self, Unit, Name='', DeviceID='', TypeName='', Options=None, **kwargs):
+        self.Unit = Unit
+        self.Name = Name
+        self.DeviceID = DeviceID
+        self.TypeName = TypeName
+        self.Options = Options or {}
+        self.nValue = 0
+        self.sValue = ''
+        self.listeners = []
+
+    def Create(self):
+        Devices[self.Unit] = self
+
+    def Update(self, nValue=0, sValue='', **kwargs):
+        self.nValue = nValue
+        self.sValue = sValue
+
+        for listener in self.listeners:
+            listener(sValue)
+
+
+# Plugin framework exposes created devices through global "Devices" mapping
+Devices = {}
@@ -0,0 +1,328 @@
+"""
+Offline benchmark of the plugins manager.
+
+Runs the manager against a fake Domoticz module, synthetic catalogs and local bare git
+repositories used as plugin remotes, and writes timings and memory usage to a JSON file.
+
+Usage:
+    python benchmarks/run.py [--sizes 10,100,1000] [--installed 10] [--repos 20] [--output bench_output.json]
+"""
+import argparse
+import json
+import os
+import platform
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+import zipfile
+
+BENCHMARKS_FOLDER = os.path.dirname(os.path.abspath(__file__))
+ROOT_FOLDER = os.path.dirname(BENCHMARKS_FOLDER)
+FAKE_DOMOTICZ_FOLDER = os.path.join(BENCHMARKS_FOLDER, 'fake_domoticz')
+DEPENDENCY = ('benchdep', '1.0')
+GIT = ['git', '-c', 'user.name=bench', '-c', 'user.email=bench@localhost', '-c', 'init.defaultBranch=master']
+IGNORED_FILES = shutil.ignore_patterns('.git', '.github', 'benchmarks', '__pycache__', '*.pyc', 'settings.json',
+                                       'update_status.json*', 'plugins.cache*', 'catalog_remote.*', 'bench_output.*',
+                                       'mirrors', 'wheels', 'trash', 'dependencies.json*')
+
+
+def git(args, cwd):
+    subprocess.run(GIT + args, cwd=cwd, check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+
+def create_remotes(base, count):
+    """Creates bare repositories with a few commits, returns their urls (without ".git" as in catalog)"""
+    urls = []
+
+    for index in range(count):
+        name = 'repo' + str(index)
+        work = os.path.join(base, 'work', name)
+        os.makedirs(work)
+        git(['init', '-q'], work)
+
+        if index == 0:
+            # Requirements are installed from the local wheel directory only
+            with open(os.path.join(work, 'requirements.txt'), 'w') as f:
+                f.write('=='.join(DEPENDENCY) + '\n')
+
+        for commit in range(5):
+            with open(os.path.join(work, 'plugin.py'), 'w') as f:
+                f.write('# plugin ' + name + ' revision ' + str(commit) + '\n' + 'x = 1\n' * 200)
+
+            git(['add', '-A'], work)
+            git(['commit', '-q', '-m', 'revision ' + str(commit)], work)
+
+        remote = os.path.join(base, 'remotes', name + '.git')
+        git(['clone', '-q', '--bare', work, remote], base)
+        git(['remote', 'add', 'origin', remote], work)
+        urls.append('file://' + os.path.join(base, 'remotes', name))
+
+    return urls
+
+
+def create_wheel(base):
+    """Builds a pure python wheel of DEPENDENCY into a local wheel directory, returns the directory"""
+    name, version = DEPENDENCY
+    wheels_folder = os.path.join(base, 'find_links')
+    dist_info = name + '-' + version + '.dist-info/'
+    files = {
+        name + '.py': 'VERSION = ' + repr(version) + '\n',
+        dist_info + 'METADATA': 'Metadata-Version: 2.1\nName: ' + name + '\nVersion: ' + version + '\n',
+        dist_info + 'WHEEL': 'Wheel-Version: 1.0\nGenerator: bench\nRoot-Is-Purelib: true\nTag: py3-none-any\n',
+    }
+    files[dist_info + 'RECORD'] = ''.join(path + ',,\n' for path in files) + dist_info + 'RECORD,,\n'
+
+    os.makedirs(wheels_folder)
+
+    with zipfile.ZipFile(os.path.join(wheels_folder, name + '-' + version + '-py3-none-any.whl'), 'w') as wheel:
+        for path, content in files.items():
+            wheel.writestr(path, content)
+
+    return wheels_folder
+
+
+def push_updates(base, count):
+    for index in range(count):
+        work = os.path.join(base, 'work', 'repo' + str(index))
+
+        with open(os.path.join(work, 'CHANGELOG'), 'a') as f:
+            f.write('update\n')
+
+        git(['add', '-A'], work)
+        git(['commit', '-q', '-m', 'update'], work)
+        git(['push', '-q', 'origin', 'HEAD:master'], work)
+
+
+def build_catalog(size, urls):
+    catalog = {}
+
+    for index in range(size):
+        key = 'plugin' + str(index)
+        catalog[key] = {
+            'author': 'author' + str(index % 17),
+            'branch': ['master'],
+            'description': 'Synthetic plugin number ' + str(index) + ' for benchmarking',
+            'folder': key,
+            'name': 'Plugin ' + str(index),
+            'repository': urls[index % len(urls)],
+        }
+
+    return catalog
+
+
+def build_environment(base, size, urls):
+    plugins_folder = os.path.join(base, 'plugins')
+    home_folder = os.path.join(plugins_folder, 'plugins-manager')
+    startup_folder = os.path.join(base, 'domoticz')
+
+    shutil.copytree(ROOT_FOLDER, home_folder, ignore=IGNORED_FILES)
+    os.makedirs(os.path.join(startup_folder, 'www', 'templates'))
+
+    with open(os.path.join(home_folder, 'plugins.json'), 'w') as f:
+        json.dump(build_catalog(size, urls), f, indent=4)
+
+    # Empty local index keeps pip offline, the dependency is found in dependencies_find_links
+    os.makedirs(os.path.join(base, 'index'))
+
+    with open(os.path.join(home_folder, 'settings.json'), 'w') as f:
+        json.dump({
+            'dependencies_python': sys.executable,
+            'dependencies_target': os.path.join(base, 'site'),
+            'dependencies_index_url': 'file://' + os.path.join(base, 'index'),
+            'dependencies_find_links': [create_wheel(base)],
+        }, f, indent=4)
+
+    return home_folder + '/', startup_folder + '/'
+
+
+class Client():
+    """Sends API requests through the transport device the same way the UI does"""
+
+    def __init__(self, plugin_module, device):
+        self.plugin_module = plugin_module
+        self.device = device
+        self.request_id = 0
+        self.lock = threading.Lock()
+        self.waiting = {}
+        self.chunks = {}
+        device.listeners.append(self.on_update)
+
+    def on_update(self, value):
+        message = json.loads(value)
+
+        if message.get('type') == 'chunk':
+            parts = self.chunks.setdefault(message['messageId'], {})
+            parts[message['index']] = message['data']
+
+            if len(parts) < message['total']:
+                return
+
+            del self.chunks[message['messageId']]
+            message = json.loads(''.join(parts[index] for index in range(message['total'])))
+
+        if message.get('type') != 'response':
+            return
+
+        with self.lock:
+            waiting = self.waiting.pop(message['requestId'], None)
+
+        if waiting is not None:
+            waiting['response'] = message
+            waiting['size'] = len(value)
+            waiting['event'].set()
+
+    def request(self, command, params=None, timeout=600):
+        """Returns (response message, duration in ms)"""
+        with self.lock:
+            self.request_id += 1
+            waiting = {'event': threading.Event(), 'response': None}
+            self.waiting[self.request_id] = waiting
+
+        started = time.time()
+        self.device.sValue = json.dumps({
+            'type': 'request',
+            'requestId': self.request_id,
+            'command': command,
+            'params': params if params is not None else {},
+        })
+        self.plugin_module.onDeviceModified(255)
+
+        if not waiting['event'].wait(timeout):
+            raise RuntimeError('Request ' + command + ' timed out')
+
+        return waiting['response'], (time.time() - started) * 1000
+
+
+def wait_for_update_checks(cache):
+    while True:
+        with cache.lock:
+            if not cache.pending:
+                return
+
+        time.sleep(0.01)
+
+
+def run_single(size, installed_count, repos_count):
+    base = tempfile.mkdtemp(prefix='pp-manager-bench-')
+
+    try:
+        urls = create_remotes(base, repos_count)
+        home_folder, startup_folder = build_environment(base, size, urls)
+        installed_count = min(installed_count, size)
+
+        sys.path.insert(0, FAKE_DOMOTICZ_FOLDER)
+        sys.path.insert(0, home_folder)
+
+        tracemalloc.start()
+        result = {'size': size, 'installed': installed_count, 'repos': repos_count}
+
+        import Domoticz
+        import plugins
+
+        started = time.time()
+        plugins.load(home_folder)
+        result['catalog_load_cold_ms'] = (time.time() - started) * 1000
+
+        started = time.time()
+        plugins.load(home_folder)
+        result['catalog_load_cached_ms'] = (time.time() - started) * 1000
+
+        started = time.time()
+        import plugin as plugin_module
+        plugin_module.Devices = Domoticz.Devices
+        plugin_module.Parameters = {
+            'HomeFolder': home_folder,
+            'StartupFolder': startup_folder,
+            'Mode1': '360',
+            'Mode2': 'full',
+            'Mode3': '',
+            'Mode6': 'Normal',
+        }
+        plugin_module.onStart()
+        result['startup_ms'] = (time.time() - started) * 1000
+
+        client = Client(plugin_module, Domoticz.Devices[255])
+        keys = ['plugin' + str(index) for index in range(installed_count)]
+
+        response, result['install_ms'] = client.request('install_many', {'keys': keys})
+        assert all(item['success'] for item in response['payload']['results'].values())
+        assert os.path.isfile(os.path.join(base, 'site', DEPENDENCY[0] + '.py')), 'Requirements were not installed'
+
+        from updates import cache
+        import manager
+
+        response, result['list_cold_ms'] = client.request('list')
+        result['list_payload_bytes'] = len(json.dumps(response))
+        wait_for_update_checks(cache)
+
+        response, result['list_full_ms'] = client.request('list')
+        version = response['payload']['version']
+        response, result['list_not_modified_ms'] = client.request('list', {'since': version})
+
+        push_updates(base, repos_count)
+        manager.remote_heads.clear()
+
+        started = time.time()
+        cache.refresh(dict((key, plugins.plugins[key]) for key in keys), force=True)
+        wait_for_update_checks(cache)
+        result['update_check_ms'] = (time.time() - started) * 1000
+
+        response, result['update_ms'] = client.request('update_many', 'outdated')
+        result['updated'] = len(response['payload']['results'])
+
+        plugin_module.onStop()
+
+        result['memory_peak_kb'] = tracemalloc.get_traced_memory()[1] // 1024
+        result['max_rss_kb'] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        tracemalloc.stop()
+
+        return result
+    finally:
+        shutil.rmtree(base, ignore_errors=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Offline benchmark of the plugins manager')
+    parser.add_argument('--sizes', default='10,100,1000', help='comma separated catalog sizes')
+    parser.add_argument('--installed', type=int, default=10, help='number of plugins to install')
+    parser.add_argument('--repos', type=int, default=20, help='number of local git remotes shared by catalog entries')
+    parser.add_argument('--output', default='bench_output.json', help='results file')
+    parser.add_argument('--single', type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.single is not None:
+        # Each catalog size runs in its own process, so module level state and memory usage are not shared
+        print(json.dumps(run_single(args.single, args.installed, args.repos)))
+        return
+
+    results = []
+
+    for size in [int(size) for size in args.sizes.split(',')]:
+        process = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), '--single', str(size),
+             '--installed', str(args.installed), '--repos', str(args.repos)],
+            stdout=subprocess.PIPE,
+            check=True,
+        )
+        result = json.loads(process.stdout.decode('utf-8').strip().splitlines()[-1])
+        print(json.dumps(result), file=sys.stderr)
+        results.append(result)
+
+    git_version = subprocess.run(['git', '--version'], stdout=subprocess.PIPE).stdout.decode('utf-8').strip()
+
+    with open(args.output, 'w') as f:
+        json.dump({
+            'timestamp': time.time(),
+            'python': platform.python_version(),
+            'git': git_version,
+            'results': results,
+        }, f, indent=4)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,93 @@
+import json
+import os
+import Domoticz
+
+settings = {
+    # How installed plugins are checked for updates: "ls-remote" (compare refs only) or "fetch" (git fetch + git status)
+    'update_check_mode': 'ls-remote',
+    # Max number of plugins checked for updates at the same time
+    'update_check_workers': 4,
+    # Seconds a single plugin update check may take before its state is reported as unknown
+    'update_check_timeout': 30,
+    # Seconds after which cached plugin update status is refreshed in background
+    'update_status_ttl': 3600,
+    # Max number of plugins scheduled for update check on a single heartbeat
+    'update_scan_batch': 3,
+    # Max number of API commands (install, update, ...) executed at the same time
+    'command_workers': 2,
+    # Default way plugins are cloned: "full", "shallow" (latest commit only), "partial" (no old file contents)
+    # or "shared" (checkout of a shared mirror in the "mirrors" folder, objects are stored once per repository)
+    'install_mode': 'full',
+    # Number of commits fetched by update of a shallow clone
+    'update_fetch_depth': 1,
+    # Max number of plugins processed at the same time by install_many / update_many / uninstall_many commands
+    'batch_workers': 3,
+    # Max size of a single API transport device update, larger messages are sent in chunks
+    'transport_chunk_size': 4000,
+    # Compress chunked messages for clients supporting it
+    'transport_compression': True,
+    # Optional URL of plugins.json to use instead of the bundled catalog
+    'catalog_url': '',
+    # Seconds between checks of the remote catalog for changes
+    'catalog_refresh_interval': 6 * 3600,
+    # Max number of git processes running at the same time, in total and per remote host
+    'git_max_processes': 4,
+    'git_max_processes_per_host': 2,
+    # Seconds a git operation may take before it is killed
+    'git_timeouts': {
+        'default': 60,
+        'ls-remote': 30,
+        'fetch': 120,
+        'pull': 300,
+        'clone': 600,
+        'gc': 1800,
+    },
+    # Install requirements.txt of plugins after install and update
+    'dependencies_install': True,
+    # Python interpreter used by Domoticz plugins, Domoticz itself does not expose it
+    'dependencies_python': 'python3',
+    # Where dependencies are installed: "user" (user site packages), "system" or path of a shared site directory
+    'dependencies_target': 'user',
+    # Optional package index url and extra wheel directories, e.g. a local index
+    'dependencies_index_url': '',
+    'dependencies_find_links': [],
+    # Max number of plugins building wheels at the same time, installation itself is always sequential
+    'dependencies_build_workers': 2,
+    # Seconds wheel building or installation of a single plugin may take
+    'dependencies_timeout': 1800,
+    # Uninstalled plugins are kept in trash for restore until they are older than max age (seconds)
+    # or the trash is larger than max size (MB), then they are deleted at most at delete rate (MB/s)
+    'trash_max_age': 7 * 24 * 3600,
+    'trash_max_size': 200,
+    'trash_delete_rate': 5,
+    # Seconds between checks of the trash limits
+    'trash_purge_interval': 3600,
+    # Seconds between scheduled git maintenance of installed plugins, 0 - disabled
+    'maintenance_interval': 0,
+    # "auto" runs "git gc --auto" (only when git finds it needed), "full" repacks and prunes every plugin
+    'maintenance_mode': 'auto',
+    # Create custom sensor device showing p95 latency of plugins list requests
+    'stats_device': False,
+    'stats_device_interval': 300,
+}
+
+
+def load(home_folder):
+    path = home_folder + 'settings.json'
+
+    if not os.path.isfile(path):
+        return
+
+    try:
+        with open(path) as f:
+            overrides = json.load(f)
+    except (OSError, ValueError) as e:
+        Domoticz.Error('Unable to read ' + path + ': ' + repr(e))
+        return
+
+    for key, value in overrides.items():
+        # Nested settings may be overridden partially
+        if isinstance(value, dict) and isinstance(settings.get(key), dict):
+            settings[key] = dict(settings[key], **value)
+        else:
+            settings[key] = value
@@ -0,0 +1,242 @@
+import hashlib
+import json
+import os
+import signal
+import subprocess
+import threading
+import time
+import Domoticz
+import config
+from stats import stats
+
+REQUIREMENTS_FILE = 'requirements.txt'
+
+
+class DependencyInstaller():
+    """
+    Installs requirements.txt of plugins using a wheel cache in the manager home folder.
+
+    Wheels are built once into the "wheels" folder and installed from there without index access, so packages
+    compiled on slow controllers are reused by other plugins and later updates. Requirements are installed again
+    only when their content (or interpreter / target) has changed.
+    """
+
+    def __init__(self):
+        self.home_folder = None
+        self.hashes = {}
+        self.lock = threading.Lock()
+        self.install_lock = threading.Lock()
+        self.build_semaphore = None
+        self.pip_available = {}
+
+    def configure(self, home_folder):
+        self.home_folder = home_folder
+        self.build_semaphore = threading.BoundedSemaphore(max(1, config.settings['dependencies_build_workers']))
+        path = home_folder + 'dependencies.json'
+
+        if not os.path.isfile(path):
+            return
+
+        try:
+            with open(path) as f:
+                hashes = json.load(f)
+        except (OSError, ValueError) as e:
+            Domoticz.Error('Unable to read ' + path + ': ' + repr(e))
+            return
+
+        with self.lock:
+            self.hashes = hashes
+
+    def install(self, plugin_folder, on_progress=None, cancel_event=None):
+        """Installs requirements of plugin if they have changed, returns False on failure"""
+        requirements = os.path.join(plugin_folder, REQUIREMENTS_FILE)
+
+        if self.home_folder is None or not config.settings['dependencies_install'] or not os.path.isfile(requirements):
+            return True
+
+        folder = os.path.basename(os.path.normpath(plugin_folder))
+        requirements_hash = self._get_hash(requirements)
+
+        with self.lock:
+            if self.hashes.get(folder) == requirements_hash:
+                Domoticz.Debug('Requirements of "' + folder + '" have not changed')
+                return True
+
+        wheels_folder = self.home_folder + 'wheels'
+        python = config.settings['dependencies_python']
+
+        if not self._has_pip(python):
+            return False
+        sources = ['--find-links', wheels_folder]
+
+        for find_links in config.settings['dependencies_find_links']:
+            sources += ['--find-links', find_links]
+
+        index = ['--index-url', config.settings['dependencies_index_url']] if config.settings['dependencies_index_url'] else []
+
+        Domoticz.Log('Installing requirements of plugin "' + folder + '"')
+
+        # Wheels of several plugins are built concurrently, already built ones are taken from the wheels folder
+        with self.build_semaphore, stats.timer('dependencies.build'):
+            if on_progress is not None:
+                on_progress('Building dependencies', 0)
+
+            if not self._run_pip(
+                [python, '-m', 'pip', 'wheel', '--prefer-binary', '--wheel-dir', wheels_folder] + sources + index + ['-r', requirements],
+                plugin_folder,
+                cancel_event
+            ):
+                return False
+
+        # Parallel pip installs into the same site directory may break each other
+        with self.install_lock, stats.timer('dependencies.install'):
+            if on_progress is not None:
+                on_progress('Installing dependencies', 50)
+
+            if not self._run_pip(
+                [python, '-m', 'pip', 'install', '--no-index'] + self._get_target_args() + sources + ['-r', requirements],
+                plugin_folder,
+                cancel_event
+            ):
+                return False
+
+        with self.lock:
+            self.hashes[folder] = requirements_hash
+
+        self._save()
+
+        if on_progress is not None:
+            on_progress('Installing dependencies', 100)
+
+        Domoticz.Log('Requirements of plugin "' + folder + '" have been installed')
+        return True
+
+    def discard(self, plugin_folder):
+        with self.lock:
+            if self.hashes.pop(os.path.basename(os.path.normpath(plugin_folder)), None) is None:
+                return
+
+        self._save()
+
+    def _get_hash(self, requirements):
+        with open(requirements, 'rb') as f:
+            content = f.read()
+
+        # Changed interpreter or target needs installation even with the same requirements
+        key = config.settings['dependencies_python'] + '\n' + config.settings['dependencies_target'] + '\n'
+        return hashlib.sha1(key.encode('utf-8') + content).hexdigest()
+
+    def _has_pip(self, python):
+        """Checks once per interpreter, pip is not installed with python3 on some distributions (e.g. Debian)"""
+        with self.lock:
+            available = self.pip_available.get(python)
+
+        if available is None:
+            try:
+                available = subprocess.run(
+                    [python, '-m', 'pip', '--version'],
+                    stdin=subprocess.DEVNULL,
+                    stdout=subprocess.DEVNULL,
+                    stderr=subprocess.DEVNULL,
+                    timeout=60
+                ).returncode == 0
+            except (OSError, subprocess.TimeoutExpired):
+                available = False
+
+            with self.lock:
+                self.pip_available[python] = available
+
+        if not available:
+            Domoticz.Error('pip is not available for ' + python + ', requirements of plugins can not be installed. ' +
+                           'Install pip (e.g. python3-pip package) or disable dependencies_install')
+
+        return available
+
+    def _get_target_args(self):
+        target = config.settings['dependencies_target']
+
+        if target == 'user':
+            return ['--user']
+        if target == 'system':
+            return []
+
+        return ['--target', target, '--upgrade']
+
+    def _run_pip(self, args, cwd, cancel_event):
+        Domoticz.Debug('Calling: "' + ' '.join(args) + '"')
+        timeout = config.settings['dependencies_timeout']
+        started = time.time()
+
+        try:
+            process = subprocess.Popen(
+                args,
+                cwd=cwd,
+                stdin=subprocess.DEVNULL,
+                stdout=subprocess.DEVNULL,
+                stderr=subprocess.PIPE,
+                env=dict(os.environ, PIP_DISABLE_PIP_VERSION_CHECK='1'),
+                start_new_session=True,
+            )
+        except OSError as e:
+            Domoticz.Error('Unable to run ' + args[0] + ': ' + repr(e))
+            return False
+
+        error = []
+        reader = threading.Thread(target=lambda: error.append(process.stderr.read()))
+        reader.start()
+        cancelled = False
+        timed_out = False
+
+        while True:
+            try:
+                process.wait(timeout=0.5)
+                break
+            except subprocess.TimeoutExpired:
+                pass
+
+            if cancel_event is not None and cancel_event.is_set():
+                cancelled = True
+            elif time.time() - started > timeout:
+                timed_out = True
+
+            if cancelled or timed_out:
+                try:
+                    os.killpg(process.pid, signal.SIGKILL)
+                except OSError:
+                    process.kill()
+
+                process.wait()
+                break
+
+        reader.join()
+
+        if cancelled:
+            Domoticz.Log('Command "' + ' '.join(args[:4]) + '" has been cancelled')
+            return False
+
+        if timed_out:
+            Domoticz.Error('Command "' + ' '.join(args[:4]) + '" timed out after ' + str(timeout) + ' seconds')
+            return False
+
+        if process.returncode != 0:
+            Domoticz.Error('Command "' + ' '.join(args[:4]) + '" failed: ' + b''.join(error).decode('utf-8', 'replace').strip()[-1000:])
+            return False
+
+        return True
+
+    def _save(self):
+        path = self.home_folder + 'dependencies.json'
+
+        with self.lock:
+            data = json.dumps(self.hashes)
+
+        try:
+            with open(path + '.tmp', 'w') as f:
+                f.write(data)
+
+            os.replace(path + '.tmp', path)
+        except OSError as e:
+            Domoticz.Error('Unable to write ' + path + ': ' + repr(e))
+
+
+dependencies = DependencyInstaller()
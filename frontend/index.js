@@ -17,12 +17,16 @@ define(['app'], function(app) {
     app.factory('ppManager', function($q, $rootScope, domoticzApi) {
         var deviceIdx = 0;
         var requestsCount = 0;
+        // Request ids are unique across tabs and page reloads, counter alone restarts in each of them
+        var requestsPrefix = Math.random().toString(36).slice(2, 10) + '-';
         var requestsQueue = [];
+        var chunks = {};
+        var supportsCompression = typeof DecompressionStream !== 'undefined';
         var onInit = init();
 
         $rootScope.$on('device_update', function(e, device) {
             if (device.idx === deviceIdx) {
-                handleResponse(JSON.parse(device.Data))
+                handleMessage(JSON.parse(device.Data))
             }
         });
 
@@ -70,7 +74,7 @@ define(['app'], function(app) {
         function sendRequest(command, params) {
             return onInit.then(function() {
                 var deferred = $q.defer();
-                var requestId = ++requestsCount;
+                var requestId = requestsPrefix + (++requestsCount);
 
                 var requestInfo = {
                     requestId: requestId,
@@ -85,7 +89,8 @@ define(['app'], function(app) {
                         type: 'request',
                         requestId: requestId,
                         command: command,
-                        params: params || {}
+                        params: params || {},
+                        compression: supportsCompression
                     })
                 }).catch(function(error) {
                     deferred.reject(error);
@@ -95,11 +100,57 @@ define(['app'], function(app) {
             });
         }
 
+        function handleMessage(data) {
+            if (data.type !== 'chunk') {
+                handleResponse(data);
+                return;
+            }
+
+            // Large messages are split by server into several chunks
+            var message = chunks[data.messageId] || (chunks[data.messageId] = { parts: [], received: 0 });
+
+            if (message.parts[data.index] === undefined) {
+                message.parts[data.index] = data.data;
+                message.received++;
+            }
+
+            if (message.received < data.total) {
+                return;
+            }
+
+            delete chunks[data.messageId];
+
+            decode(message.parts.join(''), data.encoding).then(function(text) {
+                handleResponse(JSON.parse(text));
+            });
+        }
+
+        function decode(payload, encoding) {
+            if (encoding !== 'zlib+base64') {
+                return $q.resolve(payload);
+            }
+
+            var binary = atob(payload);
+            var bytes = new Uint8Array(binary.length);
+
+            for (var i = 0; i < binary.length; i++) {
+                bytes[i] = binary.charCodeAt(i);
+            }
+
+            var stream = new Blob([bytes]).stream().pipeThrough(new DecompressionStream('deflate'));
+            return $q.resolve(new Response(stream).text());
+        }
+
         function handleResponse(data) {
             if (data.type !== 'response' && data.type !== 'status') {
                 return;
             }
 
+            if (data.type === 'status' && data.requestId === null) {
+                $rootScope.$broadcast('ppManager.status', data.payload);
+                return;
+            }
+
             var requestIndex = requestsQueue.findIndex(function(item) {
                 return item.requestId === data.requestId;
             });
@@ -125,19 +176,84 @@ define(['app'], function(app) {
         }
     });
 
-    function ppManagerController(ppManager) {
+    function ppManagerController($scope, bootbox, ppManager) {
         var $ctrl = this
+        var catalog = {};
+        var catalogVersion = null;
         $ctrl.refreshPlugins = refreshPlugins;
+        $ctrl.hasOutdatedPlugins = hasOutdatedPlugins;
+        $ctrl.updateOutdatedPlugins = updateOutdatedPlugins;
 
         $ctrl.$onInit = function() {
             refreshPlugins();
         }
 
+        $scope.$on('ppManager.status', function(e, payload) {
+            if (payload.event !== 'update_status' || !$ctrl.plugins) {
+                return;
+            }
+
+            if (!catalog[payload.key]) {
+                return;
+            }
+
+            catalog[payload.key] = Object.assign({}, catalog[payload.key], {
+                update_status: payload.update_status,
+                update_status_age: payload.update_status_age,
+                is_update_available: payload.is_update_available,
+                received_at: Date.now()
+            });
+
+            $ctrl.plugins = Object.values(catalog);
+        });
+
         function refreshPlugins() {
-            ppManager.sendRequest('list').then(function(plugins) {
-                $ctrl.plugins = Object.values(plugins)
+            var params = catalogVersion ? { since: catalogVersion } : {};
+
+            ppManager.sendRequest('list', params).then(function(response) {
+                if (response.not_modified) {
+                    return;
+                }
+
+                // Server sends only entries changed since the version we already have
+                if (response.full) {
+                    catalog = {};
+                }
+
+                var receivedAt = Date.now();
+
+                Object.values(response.plugins).forEach(function(plugin) {
+                    catalog[plugin.key] = Object.assign(plugin, { received_at: receivedAt });
+                });
+
+                response.removed.forEach(function(key) {
+                    delete catalog[key];
+                });
+
+                catalogVersion = response.version;
+                $ctrl.plugins = Object.values(catalog);
             })
         }
+
+        function hasOutdatedPlugins() {
+            return ($ctrl.plugins || []).some(function(plugin) {
+                return plugin.is_update_available;
+            });
+        }
+
+        function updateOutdatedPlugins() {
+            bootbox.confirm([
+                'Are you sure you want to update all outdated plugins?',
+                'Updating plugins without verifying their code makes your system vulnerable to developer\'s code intensions!'
+            ].join('<br /><br />'))
+                .then(function() {
+                    return ppManager.sendRequest('update_many', 'outdated');
+                })
+                .then(function(response) {
+                    return bootbox.alert(response.message);
+                }, bootbox.alert)
+                .then(refreshPlugins);
+        }
     }
 
     function ppManagerPluginsTableController($element, bootbox, ppManager, dataTableDefaultSettings) {
@@ -184,7 +300,7 @@ define(['app'], function(app) {
                     .then(function() {
                         return ppManager.sendRequest('install', { key: plugin.key, branch: selectedBranch });
                     })
-                    .then(bootbox.alert, bootbox.alert)
+                    .then(bootbox.alert, bootbox.alert, showProgress)
                     .then($ctrl.onUpdate);
             });
 
@@ -212,10 +328,29 @@ define(['app'], function(app) {
                     .then(function() {
                         return ppManager.sendRequest('update', plugin.key);
                     })
-                    .then(bootbox.alert, bootbox.alert)
+                    .then(function(response) {
+                        return bootbox.alert(response.message);
+                    }, bootbox.alert, showProgress)
                     .then($ctrl.onUpdate);
             });
 
+            table.on('change', '.branch-select', function() {
+                var plugin = table.api().row($(this).closest('tr')).data();
+                var selectedBranch = $(this).val();
+
+                // Branch of not installed plugin is only used by install action
+                if (!plugin.is_installed || plugin.is_local || selectedBranch === plugin.branch) {
+                    return;
+                }
+
+                bootbox.confirm('Are you sure you want to switch "' + plugin.name + '" plugin to branch "' + selectedBranch + '"?')
+                    .then(function() {
+                        return ppManager.sendRequest('switch_branch', { key: plugin.key, branch: selectedBranch });
+                    })
+                    .then(bootbox.alert, bootbox.alert, showProgress)
+                    .then($ctrl.onUpdate, $ctrl.onUpdate);
+            });
+
             render($ctrl.plugins);
         }
 
@@ -236,20 +371,45 @@ define(['app'], function(app) {
                 .draw();
         }
 
-        function isInstalledRenderer(isInstalled) {
+        function showProgress(status) {
+            if (status && status.event === 'progress') {
+                ShowNotify(status.stage + ': ' + status.percent + '%', 2500);
+            } else if (status && status.event === 'waiting') {
+                ShowNotify('Waiting for another operation on this plugin to finish', 2500);
+            }
+        }
+
+        function isInstalledRenderer(isInstalled, type, plugin) {
             return isInstalled
-                ? '<img src="../../images/ok.png" title="Installed" width="16" height="16" />'
+                ? '<img src="../../images/ok.png" title="' + installedTitle(plugin) + '" width="16" height="16" />'
                 : '<img src="../../images/empty16.png" width="16" height="16" />'
         }
 
-        function branchesRenderer(branches) {
+        function installedTitle(plugin) {
+            if (plugin.update_status_age === null || plugin.update_status_age === undefined) {
+                return 'Installed, update status is not checked yet';
+            }
+
+            var age = plugin.update_status_age + (Date.now() - plugin.received_at) / 1000;
+
+            return 'Installed, update status: ' + plugin.update_status +
+                ' (checked ' + Math.round(age / 60) + ' min ago)';
+        }
+
+        function branchesRenderer(branches, type, plugin) {
             if (!Array.isArray(branches)) {
                 // fallback: treat as single branch string or empty
                 branches = branches ? [branches] : [];
             }
-          
+
+            // Installed plugin may be checked out to a branch missing in the catalog
+            if (plugin.branch && branches.indexOf(plugin.branch) === -1) {
+                branches = branches.concat([plugin.branch]);
+            }
+
             var options = branches.map(function(branch) {
-                return '<option value="' + branch + '">' + branch + '</option>';
+                var selected = branch === plugin.branch ? ' selected' : '';
+                return '<option value="' + branch + '"' + selected + '>' + branch + '</option>';
             }).join('');
 
             return '<select class="branch-select">' + options + '</select>';
@@ -259,6 +419,13 @@ define(['app'], function(app) {
             var actions = [];
             var delimiter = '<img src="../../images/empty16.png" width="16" height="16" />';
 
+            // Manually installed plugins can not be managed, only their source can be opened
+            if (plugin.is_local) {
+                return plugin.source
+                    ? '<a class="btn btn-icon" href="' + plugin.source + '" target="_blank" title="' + $.t('Go to source') + '"><img src="images/details.png" /></a>'
+                    : '';
+            }
+
             if (plugin.is_update_available) {
                 actions.push('<button class="btn btn-icon js-update" title="' + $.t('Update') + '"><img src="images/mode.png" /></button>');
             } else {
@@ -0,0 +1,97 @@
+import configparser
+import os
+import Domoticz
+
+
+def get_git_dir(folder):
+    git_path = os.path.join(folder, '.git')
+
+    if os.path.isfile(git_path):
+        # Worktrees and submodules have a file with path to real git dir
+        with open(git_path) as f:
+            content = f.read().strip()
+
+        if content.startswith('gitdir:'):
+            return os.path.join(folder, content[len('gitdir:'):].strip())
+
+    if os.path.isdir(git_path):
+        return git_path
+
+    return None
+
+
+def read_git_ref(git_dir, ref):
+    ref_path = os.path.join(git_dir, ref)
+
+    if os.path.isfile(ref_path):
+        with open(ref_path) as f:
+            return f.read().strip()
+
+    # Worktrees keep branch refs in the common git dir
+    common_path = os.path.join(git_dir, 'commondir')
+
+    if os.path.isfile(common_path):
+        with open(common_path) as f:
+            return read_git_ref(os.path.normpath(os.path.join(git_dir, f.read().strip())), ref)
+
+    packed_refs_path = os.path.join(git_dir, 'packed-refs')
+
+    if os.path.isfile(packed_refs_path):
+        with open(packed_refs_path) as f:
+            for line in f:
+                parts = line.strip().split(' ')
+
+                if len(parts) == 2 and parts[1] == ref:
+                    return parts[0]
+
+    return None
+
+
+def read_git_head(git_dir):
+    """Returns (branch, sha) of checked out HEAD, branch is None for detached HEAD"""
+    with open(os.path.join(git_dir, 'HEAD')) as f:
+        head = f.read().strip()
+
+    if not head.startswith('ref:'):
+        return None, head
+
+    ref = head[len('ref:'):].strip()
+    return ref[len('refs/heads/'):], read_git_ref(git_dir, ref)
+
+
+def read_git_config(git_dir):
+    parser = configparser.ConfigParser(strict=False, interpolation=None)
+
+    common_path = os.path.join(git_dir, 'commondir')
+
+    if os.path.isfile(common_path):
+        with open(common_path) as f:
+            git_dir = os.path.normpath(os.path.join(git_dir, f.read().strip()))
+
+    try:
+        parser.read(os.path.join(git_dir, 'config'))
+    except configparser.Error as e:
+        Domoticz.Debug('Unable to parse git config in ' + git_dir + ': ' + repr(e))
+
+    return parser
+
+
+def normalize_repository_url(url):
+    """Returns comparable form of repository url, e.g. "github.com/owner/repo" for https and ssh urls"""
+    if not url:
+        return None
+
+    url = url.strip().rstrip('/')
+
+    if url.endswith('.git'):
+        url = url[:-len('.git')]
+
+    if '://' in url:
+        url = url.split('://', 1)[1]
+        # Drop credentials
+        url = url.split('@', 1)[1] if '@' in url.split('/', 1)[0] else url
+    elif '@' in url and ':' in url:
+        # scp-like syntax: git@github.com:owner/repo
+        url = url.split('@', 1)[1].replace(':', '/', 1)
+
+    return url.lower()
@@ -0,0 +1,251 @@
+import os
+import re
+import shutil
+import signal
+import subprocess
+import threading
+import time
+import Domoticz
+import config
+from git_repo import normalize_repository_url
+from stats import stats
+
+GIT_PROGRESS_RE = re.compile(r'^(?:remote: )?([A-Za-z ]+):\s+(\d+)%')
+
+# Git must never wait for user input inside Domoticz
+GIT_ENV = {
+    'GIT_TERMINAL_PROMPT': '0',
+    'GIT_SSH_COMMAND': 'ssh -o BatchMode=yes',
+    'LC_ALL': 'C',
+}
+
+# Background maintenance yields CPU and disk to Domoticz
+LOW_PRIORITY_COMMANDS = (['ionice', '-c', '3'], ['nice', '-n', '19'])
+
+semaphores_lock = threading.Lock()
+global_semaphore = None
+host_semaphores = {}
+
+
+class GitCancelledError(Exception):
+    pass
+
+
+class GitResult():
+    def __init__(self, args, returncode, stdout, stderr, duration, timed_out=False):
+        self.args = args
+        self.returncode = returncode
+        self.stdout = stdout
+        self.stderr = stderr
+        self.duration = duration
+        self.timed_out = timed_out
+
+    @property
+    def ok(self):
+        return self.returncode == 0 and not self.timed_out
+
+    def refs(self):
+        """Parses "<sha>\t<ref>" lines (ls-remote, show-ref output) into {ref: sha}"""
+        refs = {}
+
+        for line in self.stdout.splitlines():
+            parts = line.replace('\t', ' ').split(' ')
+
+            if len(parts) == 2:
+                refs[parts[1]] = parts[0]
+
+        return refs
+
+    def __repr__(self):
+        return 'GitResult(git ' + ' '.join(self.args) + ', code=' + str(self.returncode) + \
+            ', duration=' + ('%.2f' % self.duration) + ('s, timed out)' if self.timed_out else 's)')
+
+
+def get_timeout(operation):
+    timeouts = config.settings['git_timeouts']
+    return timeouts.get(operation, timeouts['default'])
+
+
+def get_host(remote):
+    url = normalize_repository_url(remote)
+
+    if not url or url.startswith('/'):
+        return 'local'
+
+    return url.split('/', 1)[0]
+
+
+def get_semaphores(remote):
+    global global_semaphore
+
+    with semaphores_lock:
+        if global_semaphore is None:
+            global_semaphore = threading.BoundedSemaphore(max(1, config.settings['git_max_processes']))
+
+        if remote is None:
+            return [global_semaphore]
+
+        host = get_host(remote)
+
+        if host not in host_semaphores:
+            host_semaphores[host] = threading.BoundedSemaphore(max(1, config.settings['git_max_processes_per_host']))
+
+        return [host_semaphores[host], global_semaphore]
+
+
+def get_low_priority_prefix():
+    prefix = []
+
+    for command in LOW_PRIORITY_COMMANDS:
+        if shutil.which(command[0]) is not None:
+            prefix += command
+
+    return prefix
+
+
+def run_git(args, cwd=None, timeout=None, remote=None, on_progress=None, cancel_event=None, low_priority=False):
+    """
+    Runs git without shell and returns GitResult.
+
+    remote - repository url accessed by the command, limits number of concurrent processes per host
+    timeout - seconds, defaults to configured timeout of the git operation (args[0])
+    on_progress - called as on_progress(stage, percent) for "--progress" output
+    cancel_event - threading.Event, kills the process and raises GitCancelledError when set
+    low_priority - run git with idle I/O class and lowest CPU priority when ionice / nice are available
+    """
+    timeout = timeout if timeout is not None else get_timeout(get_operation(args))
+    semaphores = get_semaphores(remote)
+    acquired = []
+
+    try:
+        for semaphore in semaphores:
+            semaphore.acquire()
+            acquired.append(semaphore)
+
+        result = _run(args, cwd, timeout, on_progress, cancel_event, get_low_priority_prefix() if low_priority else [])
+    finally:
+        for semaphore in reversed(acquired):
+            semaphore.release()
+
+    # Time spent waiting for free process slot is not included
+    duration = result.duration * 1000
+    stats.record('git.' + get_operation(args), duration)
+    stats.record('git.repo.' + (normalize_repository_url(remote) if remote else os.path.basename(os.path.normpath(cwd or '.'))), duration)
+
+    return result
+
+
+def get_operation(args):
+    # Skip global options like "-c key=value"
+    index = 0
+
+    while index < len(args) and args[index].startswith('-'):
+        index += 2 if args[index] in ('-c', '-C') else 1
+
+    return args[index] if index < len(args) else 'git'
+
+
+def _run(args, cwd, timeout, on_progress, cancel_event, prefix=None):
+    Domoticz.Debug('Calling: "git ' + ' '.join(args) + '"' + (' on folder ' + cwd if cwd else ''))
+    started = time.time()
+    process = subprocess.Popen(
+        (prefix or []) + ['git'] + args,
+        cwd=cwd,
+        stdin=subprocess.DEVNULL,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        env=dict(os.environ, **GIT_ENV),
+        # Own process group, so helpers spawned by git (ssh, git-remote-https) are killed together with it
+        start_new_session=True,
+    )
+    out = []
+    error = []
+    progress = {'stage': None, 'percent': -1}
+
+    def read_stdout():
+        out.append(process.stdout.read())
+
+    def read_stderr():
+        # Progress lines are terminated by "\r", so stderr is split manually
+        buffer = b''
+
+        while True:
+            chunk = process.stderr.read1(1024)
+
+            if not chunk:
+                break
+
+            buffer += chunk
+            lines = re.split(b'[\r\n]', buffer)
+            buffer = lines.pop()
+
+            for line in lines:
+                handle_line(line.decode('utf-8', 'replace'))
+
+        handle_line(buffer.decode('utf-8', 'replace'))
+
+    def handle_line(line):
+        match = GIT_PROGRESS_RE.match(line)
+
+        if match is None:
+            if line.strip():
+                error.append(line)
+            return
+
+        stage, percent = match.group(1), int(match.group(2))
+
+        # Report each stage start and every 10% to keep number of device updates low
+        if on_progress is not None and (stage != progress['stage'] or percent // 10 > progress['percent'] // 10):
+            progress.update(stage=stage, percent=percent)
+            on_progress(stage, percent)
+
+    readers = [threading.Thread(target=read_stdout), threading.Thread(target=read_stderr)]
+
+    for reader in readers:
+        reader.start()
+
+    cancelled = False
+    timed_out = False
+
+    while True:
+        try:
+            process.wait(timeout=0.1)
+            break
+        except subprocess.TimeoutExpired:
+            pass
+
+        if cancel_event is not None and cancel_event.is_set():
+            cancelled = True
+        elif timeout and time.time() - started > timeout:
+            timed_out = True
+
+        if cancelled or timed_out:
+            try:
+                os.killpg(process.pid, signal.SIGKILL)
+            except OSError:
+                process.kill()
+
+            process.wait()
+            break
+
+    for reader in readers:
+        reader.join()
+
+    if cancelled:
+        raise GitCancelledError()
+
+    result = GitResult(
+        args,
+        process.returncode,
+        b''.join(out).decode('utf-8', 'replace'),
+        '\n'.join(error),
+        time.time() - started,
+        timed_out,
+    )
+
+    if timed_out:
+        Domoticz.Error('Git command "git ' + ' '.join(args) + '" timed out after ' + str(timeout) + ' seconds')
+    else:
+        Domoticz.Debug(repr(result))
+
+    return result
@@ -0,0 +1,168 @@
+import os
+import threading
+import time
+import Domoticz
+from git_repo import get_git_dir, normalize_repository_url, read_git_config, read_git_head
+
+
+class InstalledIndex():
+    """Index of plugins folder contents, rescanned only when the folder has changed"""
+
+    def __init__(self):
+        self.plugins_folder = None
+        self.mtime = None
+        self.entries = {}
+        self.reserved_folders = set()
+        self.checked_at = 0
+        self.lock = threading.Lock()
+
+    def configure(self, plugins_folder, reserved_folders):
+        """reserved_folders are catalog folder names, they are never matched to other catalog plugins by remote url"""
+        with self.lock:
+            if plugins_folder != self.plugins_folder:
+                self.plugins_folder = plugins_folder
+                self.mtime = None
+
+            self.reserved_folders = set(reserved_folders)
+
+    def invalidate(self):
+        with self.lock:
+            self.mtime = None
+
+    def refresh(self):
+        """Rescans plugins folder if its content has changed, returns {folder name: entry}"""
+        with self.lock:
+            if self.plugins_folder is None:
+                return {}
+
+            # Plugins folder is checked at most once per second, e.g. once per whole plugins list request
+            if self.mtime is not None and time.time() - self.checked_at < 1:
+                return self.entries
+
+            try:
+                mtime = os.stat(self.plugins_folder).st_mtime
+            except OSError:
+                return {}
+
+            self.checked_at = time.time()
+
+            if mtime != self.mtime:
+                self.entries = self._scan()
+                self.mtime = mtime
+            else:
+                # Files created inside a folder do not change plugins folder mtime
+                for entry in self.entries.values():
+                    if not entry['has_plugin_py'] or not entry['is_git']:
+                        self._recheck(entry)
+
+            return self.entries
+
+    def get(self, folder_name):
+        return self.refresh().get(folder_name)
+
+    def get_git_info(self, entry):
+        """Returns entry with git branch, HEAD and remote url re-read if repository has changed since last call"""
+        with self.lock:
+            self._refresh_git_info(entry)
+
+        return entry
+
+    def find(self, folder_name, repository):
+        """Returns entry of plugin installed into folder_name or, if there is none, into another folder from the same repository"""
+        entries = self.refresh()
+
+        if folder_name in entries:
+            return entries[folder_name]
+
+        url = normalize_repository_url(repository)
+
+        with self.lock:
+            for name, entry in entries.items():
+                if name in self.reserved_folders:
+                    continue
+
+                # Remote of a folder may have been configured after it was scanned (e.g. clone in progress)
+                self._refresh_git_info(entry)
+
+                if entry['remote_url'] == url:
+                    return entry
+
+        return None
+
+    def _scan(self):
+        entries = {}
+
+        try:
+            items = list(os.scandir(self.plugins_folder))
+        except OSError as e:
+            Domoticz.Error('Unable to scan plugins folder: ' + repr(e))
+            return entries
+
+        for item in items:
+            if not item.is_dir() or item.name.startswith('.'):
+                continue
+
+            previous = self.entries.get(item.name)
+
+            # Folder scanned while it was being cloned or copied gets its plugin.py and git info checked again
+            if previous is not None:
+                self._recheck(previous)
+                entries[item.name] = previous
+                continue
+
+            entries[item.name] = {
+                'folder': item.name,
+                'path': item.path,
+                'has_plugin_py': os.path.isfile(os.path.join(item.path, 'plugin.py')),
+                'is_git': False,
+                'branch': None,
+                'head': None,
+                'remote_url': None,
+                'git_stamp': None,
+            }
+            self._refresh_git_info(entries[item.name])
+
+        return entries
+
+    def _recheck(self, entry):
+        entry['has_plugin_py'] = os.path.isfile(os.path.join(entry['path'], 'plugin.py'))
+        self._refresh_git_info(entry)
+
+    def _refresh_git_info(self, entry):
+        git_dir = get_git_dir(entry['path'])
+
+        if git_dir is None:
+            entry.update(is_git=False, branch=None, head=None, remote_url=None, git_stamp=None)
+            return
+
+        # HEAD reflog is touched on every commit, pull, reset and checkout
+        stamp = tuple(self._mtime(os.path.join(git_dir, name)) for name in ('HEAD', 'logs/HEAD', 'packed-refs', 'config'))
+
+        if stamp == entry['git_stamp']:
+            return
+
+        try:
+            (branch, head) = read_git_head(git_dir)
+            git_config = read_git_config(git_dir)
+            remote = git_config.get('branch "' + str(branch) + '"', 'remote', fallback='origin')
+            remote_url = git_config.get('remote "' + remote + '"', 'url', fallback=None)
+        except OSError as e:
+            Domoticz.Debug('Unable to read git info of ' + entry['path'] + ': ' + repr(e))
+            return
+
+        entry.update(
+            is_git=True,
+            branch=branch,
+            head=head,
+            remote_url=normalize_repository_url(remote_url),
+            git_stamp=stamp,
+        )
+
+    def _mtime(self, path):
+        try:
+            return os.stat(path).st_mtime
+        except OSError:
+            return None
+
+
+installed_index = InstalledIndex()
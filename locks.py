@@ -0,0 +1,11 @@
+import threading
+
+# Commands and maintenance changing the same plugin (git working tree) are executed one by one
+plugin_locks = {}
+plugin_locks_lock = threading.Lock()
+
+
+def get_plugin_lock(key):
+    """Returns lock of catalog plugin key"""
+    with plugin_locks_lock:
+        return plugin_locks.setdefault(key, threading.Lock())
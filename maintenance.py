@@ -0,0 +1,201 @@
+import os
+import threading
+import Domoticz
+import config
+from git_repo import get_git_dir
+from git_runner import GitCancelledError, run_git
+from installed import installed_index
+from locks import get_plugin_lock
+from plugins import plugins
+
+# Folders of the manager itself, reported separately from the manager checkout
+STORAGE_FOLDERS = ('mirrors', 'wheels', 'trash')
+
+
+def get_folder_size(path, exclude=()):
+    """Returns disk space used by files of the folder in bytes"""
+    size = 0
+
+    for root, dirs, files in os.walk(path):
+        dirs[:] = [name for name in dirs if os.path.join(root, name) not in exclude]
+
+        for name in files:
+            try:
+                stat = os.lstat(os.path.join(root, name))
+            except OSError:
+                continue
+
+            size += stat.st_blocks * 512 if hasattr(stat, 'st_blocks') else stat.st_size
+
+    return size
+
+
+class Maintenance():
+    """Disk usage of installed plugins and their git housekeeping"""
+
+    def __init__(self):
+        self.home_folder = None
+        self.usage = {}
+        self.lock = threading.Lock()
+        self.run_lock = threading.Lock()
+
+    def configure(self, home_folder):
+        self.home_folder = os.path.normpath(home_folder)
+
+    def get_report(self):
+        entries = self._get_entries()
+        plugins = [self.get_usage(entry) for entry in entries]
+        storage = {}
+
+        # Uninstalled plugins are forgotten
+        with self.lock:
+            paths = set(entry['path'] for entry in entries)
+            self.usage = dict((path, value) for path, value in self.usage.items() if path in paths)
+
+        if self.home_folder is not None:
+            for name in STORAGE_FOLDERS:
+                path = os.path.join(self.home_folder, name)
+                storage[name] = get_folder_size(path) if os.path.isdir(path) else 0
+
+        return {
+            'plugins': plugins,
+            'storage': storage,
+            'total': sum(item['worktree_size'] + item['git_size'] for item in plugins) + sum(storage.values()),
+        }
+
+    def get_usage(self, entry):
+        """Returns {folder, worktree_size, git_size}, folders are walked again only when they have changed"""
+        path = entry['path']
+        git_dir = get_git_dir(path)
+        stamp = self._get_stamp(path, git_dir)
+
+        with self.lock:
+            cached = self.usage.get(path)
+
+        if cached is not None and cached[0] == stamp:
+            return cached[1]
+
+        exclude = set([os.path.join(path, '.git')])
+
+        if self.home_folder is not None and os.path.normpath(path) == self.home_folder:
+            exclude.update(os.path.join(path, name) for name in STORAGE_FOLDERS)
+
+        usage = {
+            'folder': entry['folder'],
+            'worktree_size': get_folder_size(path, exclude),
+            'git_size': get_folder_size(git_dir) if git_dir is not None else 0,
+        }
+
+        with self.lock:
+            self.usage[path] = (stamp, usage)
+
+        return usage
+
+    def run(self, mode=None, on_progress=None, cancel_event=None):
+        """
+        Runs git gc in installed plugins one by one.
+
+        Returns {'plugins': [{folder, success, git_size, reclaimed}], 'reclaimed': bytes} or None if maintenance is already running.
+        """
+        if not self.run_lock.acquire(blocking=False):
+            return None
+
+        try:
+            mode = mode or config.settings['maintenance_mode']
+            # Objects borrowed from shared mirrors are never copied into checkouts ("gc" repacks with --local)
+            args = ['gc', '--quiet', '--auto'] if mode == 'auto' else ['gc', '--quiet']
+            entries = [entry for entry in self._get_entries() if get_git_dir(entry['path']) is not None]
+            keys = self._get_plugin_keys()
+            results = []
+
+            for index, entry in enumerate(entries):
+                if cancel_event is not None and cancel_event.is_set():
+                    break
+
+                if on_progress is not None:
+                    on_progress(entry['folder'], index * 100 // len(entries))
+
+                # Plugin changed by a running command (update, switch branch, ...) is left to the next maintenance
+                locks = [get_plugin_lock(key) for key in keys.get(entry['folder'], [])]
+                acquired = []
+
+                for lock in locks:
+                    if not lock.acquire(blocking=False):
+                        break
+
+                    acquired.append(lock)
+
+                if len(acquired) < len(locks):
+                    for lock in acquired:
+                        lock.release()
+
+                    Domoticz.Log('Maintenance of ' + entry['folder'] + ' skipped, plugin is being changed')
+                    continue
+
+                git_dir = get_git_dir(entry['path'])
+                before = get_folder_size(git_dir)
+
+                try:
+                    result = run_git(args, entry['path'], cancel_event=cancel_event, low_priority=True)
+                except GitCancelledError:
+                    break
+                except OSError as e:
+                    Domoticz.Error('Maintenance of ' + entry['folder'] + ' failed: ' + repr(e))
+                    continue
+                finally:
+                    for lock in acquired:
+                        lock.release()
+
+                if not result.ok:
+                    Domoticz.Error('Maintenance of ' + entry['folder'] + ' failed: ' + result.stderr)
+
+                after = get_folder_size(git_dir)
+                results.append({
+                    'folder': entry['folder'],
+                    'success': result.ok,
+                    'git_size': after,
+                    'reclaimed': before - after,
+                })
+
+            reclaimed = sum(item['reclaimed'] for item in results)
+            Domoticz.Log('Git maintenance of ' + str(len(results)) + ' plugins reclaimed ' + str(reclaimed // 1024) + ' KB')
+
+            return {
+                'plugins': results,
+                'reclaimed': reclaimed,
+            }
+        finally:
+            self.run_lock.release()
+
+    def _get_entries(self):
+        return sorted(installed_index.refresh().values(), key=lambda entry: entry['folder'])
+
+    def _get_plugin_keys(self):
+        """Returns {installed folder: [catalog keys]}, commands lock plugins by catalog key"""
+        keys = {}
+
+        for key, plugin in plugins.items():
+            entry = plugin.get_installed()
+
+            if entry is not None:
+                keys.setdefault(entry['folder'], []).append(key)
+
+        return keys
+
+    def _get_stamp(self, path, git_dir):
+        # Checkout, pull and gc change at least one of these
+        paths = [path]
+
+        if git_dir is not None:
+            paths += [os.path.join(git_dir, name) for name in ('index', 'logs/HEAD', 'packed-refs', 'objects', 'objects/pack')]
+
+        return tuple(self._mtime(item) for item in paths)
+
+    def _mtime(self, path):
+        try:
+            return os.stat(path).st_mtime
+        except OSError:
+            return None
+
+
+maintenance = Maintenance()
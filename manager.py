@@ -1,7 +1,82 @@
 import Domoticz
+import config
 import os
-import subprocess
+import threading
+import time
 from shutil import rmtree
+from git_repo import get_git_dir, read_git_config, read_git_head
+from git_runner import GitCancelledError, run_git
+from dependencies import dependencies
+from installed import installed_index
+from mirrors import mirrors
+from trash import trash
+
+STATUS_UP_TO_DATE = 'up-to-date'
+STATUS_BEHIND = 'behind'
+STATUS_AHEAD = 'ahead'
+STATUS_NOT_GIT = 'not-git'
+STATUS_UNKNOWN = 'unknown'
+
+INSTALL_MODE_FULL = 'full'
+INSTALL_MODE_SHALLOW = 'shallow'
+INSTALL_MODE_PARTIAL = 'partial'
+INSTALL_MODE_SHARED = 'shared'
+
+CLONE_ARGS = {
+    INSTALL_MODE_FULL: [],
+    # Only the latest commit of the branch
+    INSTALL_MODE_SHALLOW: ['--depth', '1', '--single-branch'],
+    # Whole branch history, file contents of old commits are downloaded on demand
+    INSTALL_MODE_PARTIAL: ['--filter=blob:none', '--single-branch'],
+    # Local clone of the repository mirror borrowing its objects, see mirrors.py
+    INSTALL_MODE_SHARED: ['--shared'],
+}
+
+# Changes of these files only do not need Domoticz restart
+NO_RESTART_SUFFIXES = ('.md', '.rst', '.png', '.jpg', '.jpeg', '.gif', '.svg', '.gitignore', 'LICENSE', 'CHANGELOG')
+NO_RESTART_FOLDERS = ('.github/', 'docs/', 'images/')
+
+
+def is_restart_required(files):
+    """Heuristic based on changed file paths, anything but documentation and images may change plugin behaviour"""
+    for path in files:
+        if not (path.endswith(NO_RESTART_SUFFIXES) or path.startswith(NO_RESTART_FOLDERS)):
+            return True
+
+    return False
+
+
+# Remote branch heads are shared between plugins cloned from the same repository
+REMOTE_HEADS_TTL = 60
+remote_heads = {}
+remote_heads_locks = {}
+remote_heads_lock = threading.Lock()
+
+
+def get_remote_heads(repository, timeout=None):
+    """Returns {branch: sha} of remote repository using single "git ls-remote" call"""
+    with remote_heads_lock:
+        lock = remote_heads_locks.setdefault(repository, threading.Lock())
+
+    # Concurrent checks of the same repository wait for the first one and reuse its result
+    with lock:
+        cached = remote_heads.get(repository)
+
+        if cached is not None and time.time() - cached[0] < REMOTE_HEADS_TTL:
+            return cached[1]
+
+        result = run_git(['ls-remote', '--heads', repository], timeout=timeout, remote=repository)
+
+        if not result.ok:
+            Domoticz.Debug("Git Error:" + result.stderr)
+            return None
+
+        heads = dict(
+            (ref[len('refs/heads/'):], sha) for ref, sha in result.refs().items() if ref.startswith('refs/heads/')
+        )
+
+        remote_heads[repository] = (time.time(), heads)
+        return heads
 
 
 class Plugin():
@@ -13,127 +88,357 @@ class Plugin():
         self.branch = plugin_data['branch']
         self.folder_name = plugin_data['folder']
 
-        self.plugin_folder = str(plugins_folder + self.folder_name)
+        self.plugins_folder = str(plugins_folder)
+
+    @property
+    def plugin_folder(self):
+        installed = self.get_installed()
+
+        if installed is not None:
+            return installed['path']
+
+        return self.plugins_folder + self.folder_name
+
+    def get_installed(self):
+        """Returns installed plugins index entry of this plugin, folder name may differ from catalog one"""
+        return installed_index.find(self.folder_name, self.repository)
 
     def is_installed(self):
-        return os.path.isdir(self.plugin_folder) == True
+        return self.get_installed() is not None
+
+    def get_update_status(self, timeout=None):
+        if config.settings['update_check_mode'] == 'fetch':
+            return self._get_update_status_fetch(timeout)
 
-    def is_update_available(self):
+        return self._get_update_status_ls_remote(timeout)
+
+    def _get_update_status_ls_remote(self, timeout=None):
         Domoticz.Debug('Checking plugin "' + self.name + '" for updates')
 
-        if (self.is_installed() == False):
-            return False
+        git_dir = get_git_dir(self.plugin_folder)
+
+        if git_dir is None:
+            Domoticz.Log('Plugin "' + self.name + '" is not installed from gitHub. Ignoring!.')
+            return STATUS_NOT_GIT
+
+        deadline = time.time() + timeout if timeout else None
+
+        try:
+            (branch, local_sha, remote, remote_branch) = self._get_tracking(git_dir)
+            repository = read_git_config(git_dir).get('remote "' + remote + '"', 'url', fallback=self.repository)
+
+            heads = get_remote_heads(repository, timeout)
+        except OSError as e:
+            Domoticz.Error('Unable to check plugin "' + self.name + '" for updates: ' + repr(e))
+            return STATUS_UNKNOWN
+
+        if heads is None or local_sha is None or remote_branch not in heads:
+            Domoticz.Error('Unable to find branch "' + remote_branch + '" of plugin "' + self.name + '" in ' + repository)
+            return STATUS_UNKNOWN
 
-        ppGitFetch="LANG=en_US /usr/bin/git fetch"
+        remote_sha = heads[remote_branch]
+
+        if remote_sha == local_sha:
+            return STATUS_UP_TO_DATE
+
+        # Remote head already known locally and included into HEAD means local commits were not pushed yet
         try:
-            prFetch=subprocess.Popen(ppGitFetch, cwd = self.plugin_folder, shell = True, stdout = subprocess.PIPE, stderr = subprocess.PIPE)
-            (outFetch, errorFetch)=prFetch.communicate()
+            result = run_git(['merge-base', '--is-ancestor', remote_sha, local_sha], self.plugin_folder, self._remaining(deadline))
+        except OSError as e:
+            Domoticz.Error("Git ErrorNo:" + str(e.errno))
+            Domoticz.Error("Git StrError:" + str(e.strerror))
+            return STATUS_UNKNOWN
+
+        if result.timed_out:
+            return STATUS_UNKNOWN
 
-            if outFetch:
-                Domoticz.Debug("Git Response:" + str(outFetch))
-            if errorFetch:
-                Domoticz.Debug("Git Error:" + str(errorFetch.strip()))
-        
-        except OSError as eFetch:
-            Domoticz.Error("Git ErrorNo:" + str(eFetch.errno))
-            Domoticz.Error("Git StrError:" + str(eFetch.strerror))
+        return STATUS_AHEAD if result.returncode == 0 else STATUS_BEHIND
 
+    def _get_update_status_fetch(self, timeout=None):
+        Domoticz.Debug('Checking plugin "' + self.name + '" for updates')
 
-        ppUrl="LANG=en_US /usr/bin/git status -uno"
-        Domoticz.Debug("Calling:" + ppUrl + " on folder " + self.plugin_folder)
+        deadline = time.time() + timeout if timeout else None
 
         try:
-            pr=subprocess.Popen(ppUrl, cwd = self.plugin_folder, shell = True, stdout = subprocess.PIPE, stderr = subprocess.PIPE)
-            (out, error)=pr.communicate()
-
-            if out:
-                Domoticz.Debug("Git Response:" + str(out))
-
-                if (str(out).find("up-to-date") != -1) or (str(out).find("up to date") != -1):
-                    return False
-                elif (str(out).find("Your branch is behind") != -1) and (str(str(out).find("error")) == "-1"):
-                    return True
-                elif (str(out).find("Your branch is ahead") != -1) and (str(str(out).find("error")) == "-1"):
-                    return False
-                else:
-                    Domoticz.Error('Something went wrong during plugin "' + self.name + '" update')
-                    return None
-
-            if error:
-                Domoticz.Debug("Git Error:" + str(error.strip()))
-                
-                if str(error).find("Not a git repository") != -1:
-                    Domoticz.Log('Plugin "' + self.name + '" is not installed from gitHub. Ignoring!.')
+            fetch = run_git(['fetch'], self.plugin_folder, self._remaining(deadline), self.repository)
 
+            if fetch.timed_out:
+                return STATUS_UNKNOWN
+            if fetch.stdout:
+                Domoticz.Debug("Git Response:" + fetch.stdout)
+            if fetch.stderr:
+                Domoticz.Debug("Git Error:" + fetch.stderr)
+
+            status = run_git(['status', '-uno'], self.plugin_folder, self._remaining(deadline))
         except OSError as e:
             Domoticz.Error("Git ErrorNo:" + str(e.errno))
             Domoticz.Error("Git StrError:" + str(e.strerror))
+            return STATUS_UNKNOWN
 
-        return None
+        if status.timed_out:
+            return STATUS_UNKNOWN
+
+        out = status.stdout
+
+        if out:
+            Domoticz.Debug("Git Response:" + out)
+
+            if (out.find("up-to-date") != -1) or (out.find("up to date") != -1):
+                return STATUS_UP_TO_DATE
+            elif out.find("Your branch is behind") != -1:
+                return STATUS_BEHIND
+            elif out.find("Your branch is ahead") != -1:
+                return STATUS_AHEAD
+            else:
+                Domoticz.Error('Something went wrong during plugin "' + self.name + '" update')
+                return STATUS_UNKNOWN
+
+        if status.stderr:
+            Domoticz.Debug("Git Error:" + status.stderr)
 
-    def install(self, branch=None):
+            if status.stderr.lower().find("not a git repository") != -1:
+                Domoticz.Log('Plugin "' + self.name + '" is not installed from gitHub. Ignoring!.')
+                return STATUS_NOT_GIT
+
+        return STATUS_UNKNOWN
+
+    def _remaining(self, deadline):
+        if deadline is None:
+            return None
+
+        # Zero timeout would mean no timeout at all
+        return max(deadline - time.time(), 0.001)
+
+    def is_shallow(self):
+        git_dir = get_git_dir(self.plugin_folder)
+        return git_dir is not None and os.path.isfile(os.path.join(git_dir, 'shallow'))
+
+    def install(self, branch=None, on_progress=None, cancel_event=None, mode=None):
+        """
+        Clones the plugin and installs its requirements.
+
+        Returns {'dependencies': bool} or False on failure, plugin stays installed if only its dependencies failed.
+        """
         Domoticz.Log("Installing Plugin:" + self.description)
 
+        # Installing already installed plugin retries installation of its dependencies
         if (self.is_installed()):
-            return True
-        
-        plugins_folder = os.path.dirname(str(os.getcwd()) + "/plugins/")
+            return {'dependencies': dependencies.install(self.plugin_folder, on_progress, cancel_event)}
+
+        plugins_folder = os.path.dirname(self.plugin_folder)
         repository = self.repository + ".git"
         branch = branch or self.branch[0]
-        clone_cmd="LANG=en_US /usr/bin/git clone -b " + branch + " " + repository + " " + self.folder_name
-        Domoticz.Debug("Calling: " + clone_cmd)
+        mode = mode or config.settings['install_mode']
+
+        if mode not in CLONE_ARGS:
+            Domoticz.Error('Unknown install mode "' + str(mode) + '", falling back to full clone')
+            mode = INSTALL_MODE_FULL
 
         try:
-            pr=subprocess.Popen(clone_cmd, cwd = plugins_folder, shell = True, stdout = subprocess.PIPE, stderr = subprocess.PIPE)
-            (out, error)=pr.communicate()
+            source = repository
+
+            if mode == INSTALL_MODE_SHARED:
+                source = mirrors.ensure(repository, on_progress, cancel_event)
+
+                if source is None:
+                    Domoticz.Error('Mirror of ' + repository + ' is not available, falling back to full clone')
+                    source = repository
+                    mode = INSTALL_MODE_FULL
+
+            result = run_git(
+                ['clone', '--progress'] + CLONE_ARGS[mode] + ['-b', branch, source, self.folder_name],
+                plugins_folder,
+                remote=repository if source == repository else None,
+                on_progress=on_progress,
+                cancel_event=cancel_event
+            )
+
+            # Checkout cloned from the mirror pulls updates from the original repository
+            if result.ok and source != repository:
+                result = run_git(['remote', 'set-url', 'origin', repository], os.path.join(plugins_folder, self.folder_name))
 
-            if out:
-                Domoticz.Log("Succesfully installed:" + str(out).strip)
+            if result.stdout:
+                Domoticz.Debug("Git Response:" + result.stdout)
+            if result.stderr:
+                Domoticz.Debug("Git Error:" + result.stderr)
+
+            if result.ok:
+                dependencies_ok = dependencies.install(os.path.join(plugins_folder, self.folder_name), on_progress, cancel_event)
+
+                if cancel_event is not None and cancel_event.is_set():
+                    raise GitCancelledError()
+
+                Domoticz.Log("Plugin " + self.description + " installed Succesfully")
                 Domoticz.Log("---Restarting Domoticz MAY BE REQUIRED to activate new plugins---")
-                return True
+                return {'dependencies': dependencies_ok}
 
-            if error:
-                Domoticz.Debug("Git Error:" + str(error))
-                
-                if str(error).find("Cloning into") != -1:
-                    Domoticz.Log("Plugin " + self.description + " installed Succesfully")
-                    return True
+            Domoticz.Error("Something went wrong with installation of " + self.description + ": " + result.stderr)
+
+        except GitCancelledError:
+            Domoticz.Log("Installation of plugin " + self.description + " has been cancelled")
+
+            rmtree(self.plugins_folder + self.folder_name, ignore_errors=True)
 
         except OSError as e:
             Domoticz.Error("Git ErrorNo:" + str(e.errno))
             Domoticz.Error("Git StrError:" + str(e.strerror))
-        
+
+        finally:
+            installed_index.invalidate()
+
         return False
 
-    def update(self):
+    def update(self, on_progress=None, cancel_event=None):
+        """
+        Fetches only the tracked branch and fast-forwards to it.
+
+        Returns {'old': sha, 'new': sha, 'files': [changed paths], 'restart_required': bool, 'dependencies': bool}
+        or None on failure. Failed installation of requirements does not undo the update.
+        """
         Domoticz.Log("Updating Plugin:" + self.description)
 
-        if (not self.is_update_available()):
-            return True
+        git_dir = get_git_dir(self.plugin_folder) if self.is_installed() else None
+
+        if git_dir is None:
+            Domoticz.Error("Plugin: " + self.description + " is not installed from gitHub. Cannot be updated with PP-Manager!!.")
+            return None
+
+        try:
+            (branch, old_sha, remote, remote_branch) = self._get_tracking(git_dir)
+            shallow = self.is_shallow()
+            # Depth of shallow clones is kept, fetching with depth into full clone would make it shallow
+            depth = ['--depth', str(max(1, config.settings['update_fetch_depth']))] if shallow else []
+            tracking_ref = 'refs/remotes/' + remote + '/' + remote_branch
+
+            # New objects are downloaded into the shared mirror, so fetch finds them there and downloads nothing
+            if mirrors.is_mirror_of(git_dir, self.repository + '.git'):
+                mirrors.ensure(self.repository + '.git', on_progress, cancel_event)
+
+            result = run_git(
+                ['fetch', '--progress', '--no-tags'] + depth + [remote, '+refs/heads/' + remote_branch + ':' + tracking_ref],
+                self.plugin_folder,
+                remote=self.repository,
+                on_progress=on_progress,
+                cancel_event=cancel_event
+            )
+
+            if result.ok:
+                result = run_git(['rev-parse', tracking_ref], self.plugin_folder)
+
+            if not result.ok:
+                Domoticz.Debug("Git Error:" + result.stderr)
+                Domoticz.Error("Something went wrong with update of " + self.description)
+                return None
+
+            new_sha = result.stdout.strip()
+
+            if new_sha == old_sha:
+                Domoticz.Debug('Plugin "' + self.description + '" already Up-To-Date')
+                # Dependencies failed by previous update are installed again
+                dependencies_ok = dependencies.install(self.plugin_folder, on_progress, cancel_event)
+
+                return {'old': old_sha, 'new': new_sha, 'files': [], 'restart_required': False, 'dependencies': dependencies_ok}
+
+            # History of shallow clone is cut, so the new commit is not a descendant of the old one for git
+            if shallow:
+                result = run_git(['reset', '--hard', tracking_ref], self.plugin_folder)
+            else:
+                result = run_git(['merge', '--ff-only', tracking_ref], self.plugin_folder)
+
+            if not result.ok:
+                Domoticz.Debug("Git Error:" + result.stderr)
+                Domoticz.Error("Unable to fast-forward plugin " + self.description + ", local changes have to be resolved manually")
+                return None
+
+            diff = run_git(['diff', '--name-only', old_sha, new_sha], self.plugin_folder)
+            files = diff.stdout.splitlines() if diff.ok else []
+            restart_required = not diff.ok or is_restart_required(files)
+
+            Domoticz.Log("Succesfully pulled gitHub update:" + old_sha[:7] + ".." + new_sha[:7] + " for plugin " + self.description)
+
+            if restart_required:
+                Domoticz.Log("---Restarting Domoticz MAY BE REQUIRED to activate new plugins---")
+
+            dependencies_ok = dependencies.install(self.plugin_folder, on_progress, cancel_event)
+
+            return {'old': old_sha, 'new': new_sha, 'files': files, 'restart_required': restart_required, 'dependencies': dependencies_ok}
+
+        except GitCancelledError:
+            Domoticz.Log("Update of plugin " + self.description + " has been cancelled")
+
+        except OSError as e:
+            Domoticz.Error("Git ErrorNo:" + str(e.errno))
+            Domoticz.Error("Git StrError:" + str(e.strerror))
+
+        return None
+
+    def _get_tracking(self, git_dir):
+        """Returns (branch, HEAD sha, remote name, remote branch) of checked out branch"""
+        (branch, sha) = read_git_head(git_dir)
+        git_config = read_git_config(git_dir)
+        branch = branch or self.branch[0]
+        branch_section = 'branch "' + branch + '"'
+        remote = git_config.get(branch_section, 'remote', fallback='origin')
+        remote_branch = git_config.get(branch_section, 'merge', fallback='refs/heads/' + branch)
+        remote_branch = remote_branch[len('refs/heads/'):] if remote_branch.startswith('refs/heads/') else remote_branch
+
+        return (branch, sha, remote, remote_branch)
 
-        cmd = "LANG=en_US /usr/bin/git pull --force"
-        Domoticz.Debug('Calling: "' + cmd + '" on folder ' + self.plugin_folder)
+    def switch_branch(self, branch, on_progress=None, cancel_event=None):
+        """Fetches only the target branch into the existing checkout and checks it out"""
+        Domoticz.Log('Switching plugin "' + self.name + '" to branch "' + branch + '"')
+
+        git_dir = get_git_dir(self.plugin_folder) if self.is_installed() else None
+
+        if git_dir is None:
+            Domoticz.Error('Plugin "' + self.name + '" is not installed from gitHub, branch can not be switched')
+            return False
+
+        repository = self.repository + '.git'
 
         try:
-            pr = subprocess.Popen(cmd, cwd = self.plugin_folder, shell = True, stdout = subprocess.PIPE, stderr = subprocess.PIPE)
-            (out, error) = pr.communicate()
-
-            if out:
-                Domoticz.Debug("Git Response:" + str(out))
-                if (str(out).find("Already up-to-date") != -1) or (str(out).find("Already up to date") != -1):
-                   Domoticz.Debug('Plugin "' + self.description + '" already Up-To-Date')
-                   return True
-                elif (str(out).find("Updating") != -1) and (str(str(out).find("error")) == "-1"):
-                   Domoticz.Log("Succesfully pulled gitHub update:" + str(out)[str(out).find("Updating")+8:26] + " for plugin " + self.description)
-                   Domoticz.Log("---Restarting Domoticz MAY BE REQUIRED to activate new plugins---")
-                   return True
-                else:
-                   Domoticz.Error("Something went wrong with update of " + self.description)
-
-            if error:
-                Domoticz.Debug("Git Error:" + str(error.strip()))
-                if str(error).find("Not a git repository") != -1:
-                   Domoticz.Error("Plugin: " + self.description + " is not installed from gitHub. Cannot be updated with PP-Manager!!.")
+            (current_branch, sha) = read_git_head(git_dir)
+
+            if current_branch == branch:
+                return True
+
+            refspec = '+refs/heads/' + branch + ':refs/remotes/origin/' + branch
+            source = 'origin'
+            remote = repository
+            depth = ['--depth', '1'] if self.is_shallow() else []
+
+            # Shared checkouts take the branch from the mirror, so only the mirror talks to the remote
+            if mirrors.is_mirror_of(git_dir, repository):
+                source = mirrors.ensure(repository, on_progress, cancel_event) or source
+                remote = None if source != 'origin' else remote
+
+            result = run_git(
+                ['fetch', '--progress', '--no-tags'] + depth + [source, refspec],
+                self.plugin_folder,
+                remote=remote,
+                on_progress=on_progress,
+                cancel_event=cancel_event
+            )
+
+            # Single branch clones fetch only the branch they were cloned with, later updates need the new one too
+            if result.ok:
+                fetch_refspecs = run_git(['config', '--get-all', 'remote.origin.fetch'], self.plugin_folder)
+
+                if '+refs/heads/*:refs/remotes/origin/*' not in fetch_refspecs.stdout.split():
+                    result = run_git(['remote', 'set-branches', '--add', 'origin', branch], self.plugin_folder)
+
+            if result.ok:
+                result = run_git(['checkout', '-B', branch, '--track', 'origin/' + branch], self.plugin_folder)
+
+            if result.ok:
+                Domoticz.Log('Plugin "' + self.name + '" has been switched to branch "' + branch + '"')
+                Domoticz.Log("---Restarting Domoticz MAY BE REQUIRED to activate new plugins---")
+                return True
+
+            Domoticz.Error('Unable to switch plugin "' + self.name + '" to branch "' + branch + '": ' + result.stderr)
+
+        except GitCancelledError:
+            Domoticz.Log('Branch switch of plugin "' + self.name + '" has been cancelled')
 
         except OSError as e:
             Domoticz.Error("Git ErrorNo:" + str(e.errno))
@@ -148,9 +453,34 @@ class Plugin():
             return True
 
         try:
-            rmtree(self.plugin_folder)
+            plugin_folder = self.plugin_folder
+
+            # Rename into trash is instant, folder is deleted later in background
+            if not trash.move(plugin_folder, self.repository):
+                rmtree(plugin_folder)
+
+            dependencies.discard(plugin_folder)
             return True
         except Exception as e:
             Domoticz.Error(repr(e))
+        finally:
+            installed_index.invalidate()
 
         return False
+
+    def restore(self):
+        """Moves the most recently uninstalled folder of this plugin back from the trash"""
+        if self.is_installed():
+            Domoticz.Error('Plugin "' + self.name + '" is already installed')
+            return False
+
+        entry = trash.find(self.folder_name, self.repository, installed_index.reserved_folders)
+
+        if entry is None:
+            Domoticz.Error('Plugin "' + self.name + '" is not found in trash')
+            return False
+
+        try:
+            return trash.restore(entry, self.plugins_folder + entry['folder'])
+        finally:
+            installed_index.invalidate()
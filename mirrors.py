@@ -0,0 +1,116 @@
+import hashlib
+import os
+import re
+import threading
+import time
+from shutil import rmtree
+import Domoticz
+from git_repo import normalize_repository_url
+from git_runner import run_git
+
+# Mirror fetched shortly before is not fetched again, e.g. when several branches of a repository are installed at once
+MIRROR_FETCH_TTL = 60
+
+
+class MirrorCache():
+    """
+    Bare mirrors of plugin repositories stored in the manager home folder.
+
+    Plugin checkouts are cloned from the mirror with "--shared", so git objects are stored only once per
+    repository url. Checkouts borrow objects through "objects/info/alternates", so automatic gc and pruning
+    are disabled in mirrors - removing an object still used by a checkout would corrupt it.
+    """
+
+    def __init__(self):
+        self.mirrors_folder = None
+        self.fetched_at = {}
+        self.locks = {}
+        self.lock = threading.Lock()
+
+    def configure(self, mirrors_folder):
+        self.mirrors_folder = mirrors_folder
+
+    def get_path(self, repository):
+        url = normalize_repository_url(repository)
+        name = re.sub(r'[^a-z0-9._-]+', '_', url).strip('_')
+        return os.path.join(self.mirrors_folder, name + '-' + hashlib.sha1(url.encode('utf-8')).hexdigest()[:8] + '.git')
+
+    def is_mirror_of(self, git_dir, repository):
+        """Returns True if repository git_dir borrows objects from the mirror of repository"""
+        if self.mirrors_folder is None or git_dir is None:
+            return False
+
+        try:
+            with open(os.path.join(git_dir, 'objects', 'info', 'alternates')) as f:
+                alternates = [os.path.normpath(line.strip()) for line in f if line.strip()]
+        except OSError:
+            return False
+
+        return os.path.join(self.get_path(repository), 'objects') in alternates
+
+    def ensure(self, repository, on_progress=None, cancel_event=None):
+        """Creates or refreshes mirror of repository, returns its path or None on failure"""
+        if self.mirrors_folder is None:
+            return None
+
+        path = self.get_path(repository)
+
+        with self.lock:
+            lock = self.locks.setdefault(path, threading.Lock())
+
+        # Concurrent installs from the same repository wait for a single clone / fetch
+        with lock:
+            if os.path.isdir(path):
+                if time.time() - self.fetched_at.get(path, 0) < MIRROR_FETCH_TTL:
+                    return path
+
+                result = run_git(
+                    ['fetch', '--progress', 'origin'],
+                    path,
+                    remote=repository,
+                    on_progress=on_progress,
+                    cancel_event=cancel_event
+                )
+            else:
+                result = self._create(repository, path, on_progress, cancel_event)
+
+            if not result.ok:
+                Domoticz.Error('Unable to update mirror of ' + repository + ': ' + result.stderr)
+                return None
+
+            self.fetched_at[path] = time.time()
+            return path
+
+    def _create(self, repository, path, on_progress, cancel_event):
+        os.makedirs(self.mirrors_folder, exist_ok=True)
+        tmp_path = path + '.tmp'
+        rmtree(tmp_path, ignore_errors=True)
+
+        try:
+            # Bare clone instead of "--mirror", which would also download refs like GitHub pull requests
+            result = run_git(
+                ['clone', '--bare', '--progress', repository, tmp_path],
+                self.mirrors_folder,
+                remote=repository,
+                on_progress=on_progress,
+                cancel_event=cancel_event
+            )
+
+            if result.ok:
+                result = run_git(['config', 'remote.origin.fetch', '+refs/heads/*:refs/heads/*'], tmp_path)
+
+            if result.ok:
+                result = run_git(['config', 'gc.auto', '0'], tmp_path)
+
+            if result.ok:
+                # Unfinished clone is never used as a mirror
+                os.rename(tmp_path, path)
+                Domoticz.Log('Created mirror of ' + repository)
+
+            return result
+        finally:
+            if not os.path.isdir(path):
+                rmtree(tmp_path, ignore_errors=True)
+
+
+mirrors = MirrorCache()
@@ -10,6 +10,16 @@
 		</ul>
     </description>
      <params>
+         <param field="Mode1" label="Update check interval (minutes, 0 - disabled)" width="75px" default="360" />
+         <param field="Mode2" label="Install mode" width="150px">
+            <options>
+                <option label="Full clone" value="full" default="true" />
+                <option label="Shallow clone (latest commit only)" value="shallow" />
+                <option label="Partial clone (no old file versions)" value="partial" />
+                <option label="Shared mirror (objects stored once per repository)" value="shared" />
+            </options>
+        </param>
+         <param field="Mode3" label="Remote catalog URL (optional)" width="300px" />
          <param field="Mode6" label="Debug" width="75px">
             <options>
                 <option label="True" value="Debug"/>
@@ -24,17 +34,47 @@ import Domoticz
 import platform
 import os
 from shutil import copy2
-from plugins import load
+from plugins import load, plugins, refresh_remote
+from scheduler import CatalogRefresher, MaintenanceScheduler, TrashCollector, UpdateScanner
 from api import APIManager
+from updates import cache
+from mirrors import mirrors
+from dependencies import dependencies
+from trash import trash
+from maintenance import maintenance
+from stats import stats
+import config
 import json
+import time
 
 
 class BasePlugin:
     def __init__(self):
         self.ui_name = 'plugins-manager'
+        self.heartbeat = 10
+        self.update_scanner = None
+        self.catalog_refresher = None
+        self.trash_collector = None
+        self.maintenance_scheduler = None
+        self.api_manager = None
+        self.stats_unit = 254
+        self.stats_updated_at = 0
 
     def onStart(self):
+        config.load(Parameters['HomeFolder'])
+
+        if Parameters['Mode2']:
+            config.settings['install_mode'] = Parameters['Mode2']
+
+        if Parameters['Mode3']:
+            config.settings['catalog_url'] = Parameters['Mode3']
+
         load(Parameters['HomeFolder'])
+        mirrors.configure(Parameters['HomeFolder'] + 'mirrors')
+        dependencies.configure(Parameters['HomeFolder'])
+        trash.configure(Parameters['HomeFolder'] + 'trash')
+        maintenance.configure(Parameters['HomeFolder'])
+        cache.load(Parameters['HomeFolder'])
 
         if Parameters["Mode6"] == 'Debug':
             Domoticz.Debugging(2)
@@ -48,6 +88,29 @@ class BasePlugin:
         self.install_ui()
         self.api_manager = APIManager(Devices)
 
+        if config.settings['stats_device'] and self.stats_unit not in Devices:
+            Domoticz.Device(
+                Unit=self.stats_unit,
+                DeviceID='stats',
+                Name='PP Manager list latency (p95)',
+                TypeName='Custom',
+                Options={'Custom': '1;ms'}
+            ).Create()
+
+        try:
+            update_check_interval = int(Parameters['Mode1']) * 60
+        except ValueError:
+            update_check_interval = 360 * 60
+
+        Domoticz.Heartbeat(self.heartbeat)
+        self.update_scanner = UpdateScanner(cache, update_check_interval, self.heartbeat, self.api_manager._send_update)
+        self.catalog_refresher = CatalogRefresher(Parameters['HomeFolder'], refresh_remote)
+        self.catalog_refresher.on_heartbeat()
+        self.trash_collector = TrashCollector(trash)
+        self.trash_collector.on_heartbeat()
+        # First scheduled maintenance runs one interval after start, not during Domoticz startup
+        self.maintenance_scheduler = MaintenanceScheduler(maintenance)
+
         # Send initial plugin list payload to the device on startup
         try:
             from api.commands.list import List
@@ -59,8 +122,50 @@ class BasePlugin:
             Domoticz.Error(f'Failed to send initial plugin list: {e}')
 
     def onStop(self):
+        if self.api_manager is not None:
+            self.api_manager.stop()
+
+        if self.catalog_refresher is not None:
+            self.catalog_refresher.stop()
+
+        if self.trash_collector is not None:
+            self.trash_collector.stop()
+
+        if self.maintenance_scheduler is not None:
+            self.maintenance_scheduler.stop()
+
+        cache.stop()
         self.uninstall_ui()
 
+    def onHeartbeat(self):
+        if self.update_scanner is not None:
+            self.update_scanner.on_heartbeat(plugins)
+
+        if self.catalog_refresher is not None:
+            self.catalog_refresher.on_heartbeat()
+
+        if self.trash_collector is not None:
+            self.trash_collector.on_heartbeat()
+
+        if self.maintenance_scheduler is not None:
+            self.maintenance_scheduler.on_heartbeat()
+
+        self.update_stats_device()
+
+    def update_stats_device(self):
+        if not config.settings['stats_device'] or self.stats_unit not in Devices:
+            return
+
+        # Device history is stored by Domoticz, so it is not updated on every heartbeat
+        if time.time() - self.stats_updated_at < config.settings['stats_device_interval']:
+            return
+
+        self.stats_updated_at = time.time()
+        summary = stats.get('command.list')
+
+        if summary is not None:
+            Devices[self.stats_unit].Update(nValue=0, sValue=str(summary['p95']))
+
     def onDeviceModified(self, unit):
         Domoticz.Log(f"onDeviceModified called for unit: {unit}")
         if (unit == self.api_manager.unit):
@@ -117,6 +222,11 @@ def onStop():
     _plugin.onStop()
 
 
+def onHeartbeat():
+    global _plugin
+    _plugin.onHeartbeat()
+
+
 def onDeviceModified(Unit):
     global _plugin
     _plugin.onDeviceModified(Unit)
@@ -1,13 +1,216 @@
+from collections.abc import Mapping
+import hashlib
 import json
 import os
+import pickle
+import threading
+import urllib.error
+import urllib.request
+import Domoticz
+import config
+from installed import installed_index
 from manager import Plugin
+from search import SearchIndex
+
+CACHE_VERSION = 1
+
+
+class CatalogRecord():
+    """Compact catalog entry, full Plugin object is built from it on first access"""
+    __slots__ = ('name', 'author', 'description', 'repository', 'branch', 'folder')
+
+    def __init__(self, plugin_data):
+        for field in self.__slots__:
+            setattr(self, field, plugin_data[field])
+
+    def __getitem__(self, field):
+        return getattr(self, field)
+
+
+class Catalog(Mapping):
+    def __init__(self):
+        # (plugins folder, records, plugin instances, search index) are swapped at once on catalog refresh
+        self.state = ('', {}, {}, SearchIndex({}))
+        self.lock = threading.Lock()
+
+    def __getitem__(self, key):
+        return self._get(self.state, key)
+
+    def __iter__(self):
+        return iter(self.state[1])
+
+    def items(self):
+        # Catalog may be replaced during iteration, so keys and plugins come from the same state
+        state = self.state
+        return [(key, self._get(state, key)) for key in state[1]]
+
+    def values(self):
+        state = self.state
+        return [self._get(state, key) for key in state[1]]
+
+    def __len__(self):
+        return len(self.state[1])
+
+    def __contains__(self, key):
+        return key in self.state[1]
+
+    @property
+    def records(self):
+        return self.state[1]
+
+    @property
+    def search_index(self):
+        return self.state[3]
+
+    def _get(self, state, key):
+        (plugins_folder, records, instances, search_index) = state
+        instance = instances.get(key)
+
+        if instance is not None:
+            return instance
+
+        record = records[key]
+
+        with self.lock:
+            return instances.setdefault(key, Plugin(plugins_folder, record))
+
+    def replace(self, plugins_folder, records):
+        installed_index.configure(plugins_folder, [record.folder for record in records.values()])
+        self.state = (plugins_folder, records, {}, SearchIndex(records))
+
+
+plugins = Catalog()
 
-plugins = {}
 
 def load(home_folder):
-    f = open(home_folder + 'plugins.json')
-    plugins_raw = json.load(f)
     plugins_folder = os.path.abspath(home_folder + '../') + '/'
+    remote_path = home_folder + 'catalog_remote.json'
+
+    # Previously downloaded remote catalog has priority over the bundled one
+    if config.settings['catalog_url'] and os.path.isfile(remote_path):
+        try:
+            plugins.replace(plugins_folder, load_records(remote_path, home_folder + 'catalog_remote.cache'))
+            return
+        except Exception as e:
+            Domoticz.Error('Unable to load remote catalog copy, falling back to bundled one: ' + repr(e))
+
+    plugins.replace(plugins_folder, load_records(home_folder + 'plugins.json', home_folder + 'plugins.cache'))
+
+
+def refresh_remote(home_folder, timeout=30):
+    """Downloads remote catalog if it has changed and swaps loaded plugins, returns True if catalog was changed"""
+    url = config.settings['catalog_url']
+
+    if not url:
+        return False
+
+    remote_path = home_folder + 'catalog_remote.json'
+    meta_path = home_folder + 'catalog_remote.meta.json'
+    meta = {}
+
+    if os.path.isfile(remote_path) and os.path.isfile(meta_path):
+        try:
+            with open(meta_path) as f:
+                meta = json.load(f)
+        except (OSError, ValueError):
+            meta = {}
+
+    request = urllib.request.Request(url)
+
+    if meta.get('etag'):
+        request.add_header('If-None-Match', meta['etag'])
+    if meta.get('last_modified'):
+        request.add_header('If-Modified-Since', meta['last_modified'])
+
+    try:
+        with urllib.request.urlopen(request, timeout=timeout) as response:
+            content = response.read()
+            etag = response.headers.get('ETag')
+            last_modified = response.headers.get('Last-Modified')
+    except urllib.error.HTTPError as e:
+        if e.code == 304:
+            Domoticz.Debug('Remote catalog is not modified')
+        else:
+            Domoticz.Error('Unable to download remote catalog from ' + url + ': HTTP ' + str(e.code))
+        return False
+    except (urllib.error.URLError, OSError) as e:
+        Domoticz.Error('Unable to download remote catalog from ' + url + ': ' + repr(e))
+        return False
+
+    try:
+        records = dict((key, CatalogRecord(value)) for key, value in json.loads(content.decode('utf-8')).items())
+    except Exception as e:
+        Domoticz.Error('Remote catalog from ' + url + ' is invalid: ' + repr(e))
+        return False
+
+    try:
+        write_file(remote_path, content)
+        write_file(meta_path, json.dumps({'etag': etag, 'last_modified': last_modified}).encode('utf-8'))
+    except OSError as e:
+        Domoticz.Error('Unable to store remote catalog: ' + repr(e))
+
+    Domoticz.Log('Remote catalog has been updated, ' + str(len(records)) + ' plugins available')
+    plugins.replace(plugins.state[0], records)
+    return True
+
+
+def load_records(path, cache_path):
+    """Returns {key: CatalogRecord} from plugins.json, using pickled index while the file is unchanged"""
+    stat = os.stat(path)
+    cached = read_cache(cache_path)
+
+    if cached is not None and cached['mtime'] == stat.st_mtime and cached['size'] == stat.st_size:
+        return cached['records']
+
+    with open(path, 'rb') as f:
+        content = f.read()
+
+    content_hash = hashlib.sha1(content).hexdigest()
+
+    if cached is not None and cached['hash'] == content_hash:
+        records = cached['records']
+    else:
+        records = dict((key, CatalogRecord(value)) for key, value in json.loads(content.decode('utf-8')).items())
+
+    write_cache(cache_path, {
+        'version': CACHE_VERSION,
+        'mtime': stat.st_mtime,
+        'size': stat.st_size,
+        'hash': content_hash,
+        'records': records,
+    })
+
+    return records
+
+
+def read_cache(cache_path):
+    if not os.path.isfile(cache_path):
+        return None
+
+    try:
+        with open(cache_path, 'rb') as f:
+            cached = pickle.load(f)
+    except Exception as e:
+        Domoticz.Debug('Unable to read catalog cache: ' + repr(e))
+        return None
+
+    if not isinstance(cached, dict) or cached.get('version') != CACHE_VERSION:
+        return None
+
+    return cached
+
+
+def write_cache(cache_path, data):
+    try:
+        write_file(cache_path, pickle.dumps(data, pickle.HIGHEST_PROTOCOL))
+    except OSError as e:
+        Domoticz.Debug('Unable to write catalog cache: ' + repr(e))
+
+
+def write_file(path, content):
+    tmp_path = path + '.tmp'
+
+    with open(tmp_path, 'wb') as f:
+        f.write(content)
 
-    for key, value in plugins_raw.items():
-        plugins[key] = Plugin(plugins_folder, value)
+    os.replace(tmp_path, path)
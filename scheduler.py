@@ -0,0 +1,140 @@
+import math
+import threading
+import time
+import Domoticz
+import config
+from manager import STATUS_BEHIND
+
+
+class UpdateScanner():
+    """Refreshes installed plugins update status a few plugins per heartbeat"""
+
+    def __init__(self, cache, interval, heartbeat, send_update):
+        self.cache = cache
+        self.interval = interval
+        self.heartbeat = heartbeat
+        self.send_update = send_update
+        self.position = 0
+
+    def on_heartbeat(self, plugins):
+        self._send_changes()
+
+        if self.interval <= 0:
+            return
+
+        installed = [(key, plugin) for key, plugin in plugins.items() if plugin.is_installed()]
+
+        if not installed:
+            return
+
+        # Spread refresh of all installed plugins evenly over the interval
+        batch_size = math.ceil(len(installed) * self.heartbeat / self.interval)
+        batch_size = max(1, min(batch_size, config.settings['update_scan_batch']))
+        batch = {}
+
+        for i in range(min(batch_size, len(installed))):
+            key, plugin = installed[(self.position + i) % len(installed)]
+            batch[key] = plugin
+
+        self.position = (self.position + batch_size) % len(installed)
+        self.cache.refresh(batch, max_age=self.interval)
+
+    def _send_changes(self):
+        for key, status in self.cache.pop_changes():
+            Domoticz.Debug('Update status of plugin "' + key + '" changed to ' + status)
+            self.send_update(None, {
+                'event': 'update_status',
+                'key': key,
+                'update_status': status,
+                'is_update_available': status == STATUS_BEHIND,
+                'update_status_age': 0,
+            })
+
+
+class CatalogRefresher():
+    """Periodically checks remote catalog for changes in background thread"""
+
+    def __init__(self, home_folder, refresh):
+        self.home_folder = home_folder
+        self.refresh = refresh
+        self.last_refresh = 0
+        self.thread = None
+
+    def on_heartbeat(self):
+        if not config.settings['catalog_url']:
+            return
+
+        if self.thread is not None and self.thread.is_alive():
+            return
+
+        if time.time() - self.last_refresh < config.settings['catalog_refresh_interval']:
+            return
+
+        self.last_refresh = time.time()
+        self.thread = threading.Thread(target=self.refresh, args=(self.home_folder,), daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        # Download is bounded by catalog request timeout, catalog is not replaced after the plugin has stopped
+        if self.thread is not None:
+            self.thread.join()
+            self.thread = None
+
+
+class TrashCollector():
+    """Periodically deletes expired trash entries in background thread"""
+
+    def __init__(self, trash):
+        self.trash = trash
+        self.last_purge = 0
+        self.thread = None
+
+    def on_heartbeat(self):
+        if self.thread is not None and self.thread.is_alive():
+            return
+
+        if time.time() - self.last_purge < config.settings['trash_purge_interval']:
+            return
+
+        self.last_purge = time.time()
+        self.thread = threading.Thread(target=self.trash.purge, daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        # Deletion is interrupted between files, so no file is deleted after the plugin has stopped
+        self.trash.stop()
+
+        if self.thread is not None:
+            self.thread.join()
+            self.thread = None
+
+
+class MaintenanceScheduler():
+    """Runs git maintenance of installed plugins in background thread every maintenance_interval seconds"""
+
+    def __init__(self, maintenance):
+        self.maintenance = maintenance
+        self.last_run = time.time()
+        self.thread = None
+        self.stop_event = threading.Event()
+
+    def on_heartbeat(self):
+        interval = config.settings['maintenance_interval']
+
+        if interval <= 0 or self.stop_event.is_set() or (self.thread is not None and self.thread.is_alive()):
+            return
+
+        if time.time() - self.last_run < interval:
+            return
+
+        self.last_run = time.time()
+        self.thread = threading.Thread(target=self.maintenance.run, kwargs={'cancel_event': self.stop_event}, daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        # Running git gc is killed, so it does not outlive the plugin
+        self.stop_event.set()
+
+        if self.thread is not None:
+            self.thread.join()
+            self.thread = None
@@ -0,0 +1,65 @@
+from bisect import bisect_left
+import re
+from git_repo import normalize_repository_url
+
+TOKEN_RE = re.compile(r'[a-z0-9]+')
+SORT_FIELDS = ('name', 'author')
+
+
+def tokenize(text):
+    return TOKEN_RE.findall(str(text or '').lower())
+
+
+class SearchIndex():
+    """Inverted index of catalog records built once per catalog load, tokens of query are matched as prefixes"""
+
+    def __init__(self, records):
+        postings = {}
+
+        for key, record in records.items():
+            for field in (key, record.name, record.description, record.author):
+                for token in tokenize(field):
+                    postings.setdefault(token, set()).add(key)
+
+        self.postings = postings
+        # Installed folders matching neither are plugins installed manually
+        self.folders = set(record.folder for record in records.values())
+        self.repositories = set(normalize_repository_url(record.repository) for record in records.values())
+        self.tokens = sorted(postings)
+        self.sort_values = dict(
+            (field, dict((key, str(getattr(record, field) or '').lower()) for key, record in records.items()))
+            for field in SORT_FIELDS
+        )
+        # Catalog keys pre-sorted by each sort field, ties are ordered by key
+        self.orders = dict(
+            (field, sorted(records, key=lambda key, values=values: (values[key], key)))
+            for field, values in self.sort_values.items()
+        )
+
+    def search(self, query):
+        """Returns set of keys matching all query tokens, None if query is empty (everything matches)"""
+        tokens = tokenize(query)
+
+        if not tokens:
+            return None
+
+        result = None
+
+        for token in tokens:
+            keys = set()
+            index = bisect_left(self.tokens, token)
+
+            while index < len(self.tokens) and self.tokens[index].startswith(token):
+                keys.update(self.postings[self.tokens[index]])
+                index += 1
+
+            result = keys if result is None else result & keys
+
+            if not result:
+                return set()
+
+        return result
+
+    def get_order(self, field, descending=False):
+        order = self.orders[field]
+        return reversed(order) if descending else iter(order)
@@ -0,0 +1,82 @@
+from collections import deque
+from contextlib import contextmanager
+import threading
+import time
+
+
+class Histogram():
+    """Rolling window of recent samples with percentiles over the window and totals over the whole run"""
+
+    def __init__(self, size):
+        self.samples = deque(maxlen=size)
+        self.count = 0
+        self.total = 0
+        self.max = 0
+
+    def add(self, value):
+        self.samples.append(value)
+        self.count += 1
+        self.total += value
+        self.max = max(self.max, value)
+
+    def summary(self):
+        samples = sorted(self.samples)
+
+        return {
+            'count': self.count,
+            'avg': round(self.total / self.count, 1) if self.count else 0,
+            'p50': round(self.percentile(samples, 50), 1),
+            'p95': round(self.percentile(samples, 95), 1),
+            'max': round(self.max, 1),
+        }
+
+    def percentile(self, samples, percent):
+        if not samples:
+            return 0
+
+        return samples[min(len(samples) - 1, int(len(samples) * percent / 100))]
+
+
+class Stats():
+    def __init__(self, size=200):
+        self.size = size
+        self.histograms = {}
+        self.lock = threading.Lock()
+
+    def record(self, name, value):
+        with self.lock:
+            histogram = self.histograms.get(name)
+
+            if histogram is None:
+                histogram = self.histograms[name] = Histogram(self.size)
+
+            histogram.add(value)
+
+    @contextmanager
+    def timer(self, *names):
+        """Records wall time of the block in milliseconds under each of given names"""
+        started = time.time()
+
+        try:
+            yield
+        finally:
+            duration = (time.time() - started) * 1000
+
+            for name in names:
+                self.record(name, duration)
+
+    def get(self, name):
+        with self.lock:
+            histogram = self.histograms.get(name)
+            return histogram.summary() if histogram is not None else None
+
+    def snapshot(self):
+        with self.lock:
+            return dict((name, histogram.summary()) for name, histogram in sorted(self.histograms.items()))
+
+    def reset(self):
+        with self.lock:
+            self.histograms = {}
+
+
+stats = Stats()
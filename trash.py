@@ -0,0 +1,230 @@
+import json
+import os
+import threading
+import time
+import Domoticz
+import config
+from git_repo import normalize_repository_url
+
+DELETING_SUFFIX = '.deleting'
+
+
+class Trash():
+    """
+    Uninstalled plugin folders renamed into the "trash" folder of the manager home folder.
+
+    Rename is instant on the same filesystem, so uninstall does not wait for deletion of large .git folders and
+    the plugin may be restored without cloning it again. Entries are deleted in background with throttled I/O
+    once they are older than trash_max_age or the trash is larger than trash_max_size.
+    """
+
+    def __init__(self):
+        self.trash_folder = None
+        self.sizes = {}
+        self.lock = threading.Lock()
+        self.stop_event = threading.Event()
+
+    def configure(self, trash_folder):
+        self.trash_folder = trash_folder
+        self.stop_event.clear()
+
+    def move(self, path, repository=None):
+        """Moves plugin folder into the trash, returns False if it is not possible (e.g. other filesystem)"""
+        if self.trash_folder is None:
+            return False
+
+        folder = os.path.basename(os.path.normpath(path))
+        name = str(int(time.time() * 1000)) + '-' + folder
+
+        try:
+            os.makedirs(self.trash_folder, exist_ok=True)
+            os.rename(path, os.path.join(self.trash_folder, name))
+        except OSError as e:
+            Domoticz.Debug('Unable to move ' + path + ' to trash: ' + repr(e))
+            return False
+
+        try:
+            with open(os.path.join(self.trash_folder, name + '.json'), 'w') as f:
+                json.dump({'folder': folder, 'repository': normalize_repository_url(repository), 'trashed_at': time.time()}, f)
+        except OSError as e:
+            Domoticz.Error('Unable to write trash entry info of ' + folder + ': ' + repr(e))
+
+        Domoticz.Log('Plugin folder ' + folder + ' has been moved to trash')
+        return True
+
+    def get_entries(self):
+        """Returns trash entries ordered from the oldest one"""
+        entries = []
+
+        try:
+            names = os.listdir(self.trash_folder) if self.trash_folder is not None else []
+        except OSError:
+            return entries
+
+        for name in names:
+            path = os.path.join(self.trash_folder, name)
+
+            if name.endswith('.json') or name.endswith(DELETING_SUFFIX) or not os.path.isdir(path):
+                continue
+
+            try:
+                with open(path + '.json') as f:
+                    info = json.load(f)
+            except (OSError, ValueError):
+                # Entry info is only a hint, time and folder are encoded in the entry name as well
+                timestamp, _, folder = name.partition('-')
+                info = {'folder': folder, 'repository': None, 'trashed_at': int(timestamp) / 1000 if timestamp.isdigit() else 0}
+
+            entries.append(dict(info, name=name, path=path))
+
+        return sorted(entries, key=lambda entry: entry['trashed_at'])
+
+    def find(self, folder_name, repository, reserved_folders=()):
+        """
+        Returns the most recently trashed entry of plugin folder, or of its repository if there is none.
+
+        Entries of reserved_folders (other catalog plugins) are never matched by repository.
+        """
+        url = normalize_repository_url(repository)
+        entries = list(reversed(self.get_entries()))
+
+        for entry in entries:
+            if entry['folder'] == folder_name:
+                return entry
+
+        for entry in entries:
+            if url is not None and entry['repository'] == url and entry['folder'] not in reserved_folders:
+                return entry
+
+        return None
+
+    def restore(self, entry, path):
+        if os.path.exists(path):
+            Domoticz.Error('Unable to restore ' + entry['folder'] + ', folder ' + path + ' already exists')
+            return False
+
+        try:
+            os.rename(entry['path'], path)
+        except OSError as e:
+            Domoticz.Error('Unable to restore ' + entry['folder'] + ': ' + repr(e))
+            return False
+
+        self._remove_info(entry['name'])
+        Domoticz.Log('Plugin folder ' + entry['folder'] + ' has been restored from trash')
+        return True
+
+    def stop(self):
+        self.stop_event.set()
+
+    def purge(self):
+        """Deletes entries over age and total size limits, the oldest first"""
+        if self.trash_folder is None or not os.path.isdir(self.trash_folder):
+            return
+
+        # Deletions interrupted by restart
+        for name in os.listdir(self.trash_folder):
+            if self.stop_event.is_set():
+                return
+
+            if name.endswith(DELETING_SUFFIX):
+                self._delete(name)
+
+        entries = self.get_entries()
+        max_age = config.settings['trash_max_age']
+        max_size = config.settings['trash_max_size'] * 1024 * 1024
+        total = sum(self._get_size(entry) for entry in entries)
+
+        for entry in entries:
+            if self.stop_event.is_set():
+                return
+
+            if time.time() - entry['trashed_at'] <= max_age and total <= max_size:
+                break
+
+            total -= self._get_size(entry)
+
+            # Renamed first, so restore never picks a partially deleted entry
+            try:
+                os.rename(entry['path'], entry['path'] + DELETING_SUFFIX)
+            except OSError as e:
+                Domoticz.Error('Unable to delete trash entry ' + entry['name'] + ': ' + repr(e))
+                continue
+
+            self._remove_info(entry['name'])
+            self._delete(entry['name'] + DELETING_SUFFIX)
+            Domoticz.Debug('Trash entry ' + entry['name'] + ' has been deleted')
+
+    def _get_size(self, entry):
+        with self.lock:
+            size = self.sizes.get(entry['name'])
+
+        if size is None:
+            size = 0
+
+            for root, dirs, files in os.walk(entry['path']):
+                # Partial size is not cached, purge returns as soon as it sees the stop event
+                if self.stop_event.is_set():
+                    return size
+
+                for name in files:
+                    try:
+                        size += os.lstat(os.path.join(root, name)).st_size
+                    except OSError:
+                        pass
+
+            with self.lock:
+                self.sizes[entry['name']] = size
+
+        return size
+
+    def _delete(self, name):
+        """Deletes folder file by file keeping deletion rate under trash_delete_rate MB/s"""
+        path = os.path.join(self.trash_folder, name)
+        rate = config.settings['trash_delete_rate'] * 1024 * 1024
+        started = time.time()
+        deleted = 0
+
+        for root, dirs, files in os.walk(path, topdown=False):
+            for file_name in files:
+                file_path = os.path.join(root, file_name)
+
+                try:
+                    deleted += os.lstat(file_path).st_size
+                    os.unlink(file_path)
+                except OSError as e:
+                    Domoticz.Debug('Unable to delete ' + file_path + ': ' + repr(e))
+
+                # Sleeping between files leaves I/O bandwidth of SD card to Domoticz
+                delay = deleted / rate - (time.time() - started) if rate > 0 else 0
+
+                if delay > 0 and self.stop_event.wait(delay):
+                    return
+
+            for dir_name in dirs:
+                dir_path = os.path.join(root, dir_name)
+
+                try:
+                    # Symbolic links to folders are listed as folders, but are not followed
+                    if os.path.islink(dir_path):
+                        os.unlink(dir_path)
+                    else:
+                        os.rmdir(dir_path)
+                except OSError:
+                    pass
+
+        try:
+            os.rmdir(path)
+        except OSError as e:
+            Domoticz.Debug('Unable to delete ' + path + ': ' + repr(e))
+
+        with self.lock:
+            self.sizes.pop(name[:-len(DELETING_SUFFIX)] if name.endswith(DELETING_SUFFIX) else name, None)
+
+    def _remove_info(self, name):
+        try:
+            os.remove(os.path.join(self.trash_folder, name + '.json'))
+        except OSError:
+            pass
+
+
+trash = Trash()
@@ -0,0 +1,138 @@
+from concurrent.futures import ThreadPoolExecutor
+import json
+import os
+import threading
+import time
+import Domoticz
+import config
+from manager import STATUS_UNKNOWN
+from stats import stats
+
+
+class UpdateStatusCache():
+    """Keeps last known update status of installed plugins and refreshes it in background"""
+
+    def __init__(self):
+        self.entries = {}
+        self.path = None
+        self.lock = threading.Lock()
+        self.pending = set()
+        self.changes = []
+        self.executor = None
+
+    def load(self, home_folder):
+        self.path = home_folder + 'update_status.json'
+
+        if not os.path.isfile(self.path):
+            return
+
+        try:
+            with open(self.path) as f:
+                entries = json.load(f)
+        except (OSError, ValueError) as e:
+            Domoticz.Error('Unable to read ' + self.path + ': ' + repr(e))
+            return
+
+        with self.lock:
+            self.entries = entries
+
+    def save(self):
+        if self.path is None:
+            return
+
+        with self.lock:
+            data = json.dumps(self.entries)
+
+        try:
+            tmp_path = self.path + '.tmp'
+
+            with open(tmp_path, 'w') as f:
+                f.write(data)
+
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            Domoticz.Error('Unable to write ' + self.path + ': ' + repr(e))
+
+    def stop(self):
+        # Checks have git timeouts, waiting for them keeps git and status file writes from outliving the plugin
+        if self.executor is not None:
+            self.executor.shutdown(wait=True)
+            self.executor = None
+
+    def get(self, key):
+        """Returns (status, age in seconds) or (None, None) if plugin was never checked"""
+        with self.lock:
+            entry = self.entries.get(key)
+
+        if entry is None:
+            return None, None
+
+        return entry['status'], max(int(time.time() - entry['checked_at']), 0)
+
+    def set(self, key, status):
+        with self.lock:
+            self.entries[key] = {'status': status, 'checked_at': time.time()}
+
+        self.save()
+
+    def discard(self, key):
+        with self.lock:
+            if self.entries.pop(key, None) is None:
+                return
+
+        self.save()
+
+    def pop_changes(self):
+        """Returns [(key, status)] of plugins which status has changed by background checks since last call"""
+        with self.lock:
+            changes, self.changes = self.changes, []
+
+        return changes
+
+    def is_stale(self, key, max_age=None):
+        status, age = self.get(key)
+        return status is None or age > (max_age or config.settings['update_status_ttl'])
+
+    def refresh(self, plugins, force=False, max_age=None):
+        """Schedules background update check of given {key: plugin} items which status is stale"""
+        for key, plugin in plugins.items():
+            if not force and not self.is_stale(key, max_age):
+                continue
+
+            with self.lock:
+                if key in self.pending:
+                    continue
+
+                self.pending.add(key)
+
+            self._get_executor().submit(self._check, key, plugin)
+
+    def _get_executor(self):
+        if self.executor is None:
+            self.executor = ThreadPoolExecutor(max_workers=max(1, config.settings['update_check_workers']))
+
+        return self.executor
+
+    def _check(self, key, plugin):
+        try:
+            with stats.timer('update_check', 'update_check.' + key):
+                status = plugin.get_update_status(config.settings['update_check_timeout'])
+        except Exception as e:
+            Domoticz.Error('Update check of plugin "' + key + '" failed: ' + repr(e))
+            status = STATUS_UNKNOWN
+
+        with self.lock:
+            previous = self.entries.get(key)
+
+            if previous is None or previous['status'] != status:
+                self.changes.append((key, status))
+
+            self.entries[key] = {'status': status, 'checked_at': time.time()}
+            self.pending.discard(key)
+            is_last = len(self.pending) == 0
+
+        if is_last:
+            self.save()
+
+
+cache = UpdateStatusCache()